@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Seeded generator for synthetic Logseq graphs
+
+Produces a graph with the layout Logseq writes (pages/, journals/, assets/,
+logseq/) so the migration can be timed at sizes the example files cannot
+reach. The same seed and parameters always produce the same graph.
+"""
+
+import argparse
+import os
+import random
+import uuid
+
+TASK_KEYWORDS = ['TODO', 'DOING', 'NOW', 'LATER', 'WAITING', 'DONE', 'CANCELED']
+WORDS = ('alpha beta gamma delta migration review draft meeting notes design '
+         'project client backlog release sprint retro plan idea research').split()
+
+
+def generate_graph(root, pages=1000, journal_days=365, blocks_per_page=12,
+                   id_ratio=0.15, ref_density=0.1, fence_ratio=0.05,
+                   tag_cardinality=200, assets=20, asset_size=64 * 1024, seed=0):
+    """Write a synthetic graph under root and return a summary dict"""
+    rng = random.Random(seed)
+    tags = [f"{rng.choice(WORDS)} {i}" for i in range(max(1, tag_cardinality))]
+    known_ids = []
+    counts = {'pages': 0, 'journals': 0, 'blocks': 0, 'ids': 0, 'refs': 0, 'assets': 0, 'bytes': 0}
+
+    def sentence(n=6):
+        return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+    def block_lines(depth):
+        indent = '  ' * depth
+        text = sentence()
+        roll = rng.random()
+        if roll < 0.25:
+            text = f"{rng.choice(TASK_KEYWORDS)} {text}"
+        if rng.random() < 0.2:
+            text += f" #[[{rng.choice(tags)}]]"
+        if rng.random() < 0.1:
+            text += f" see [[{2020 + rng.randrange(4)}_{rng.randrange(1, 13):02d}_{rng.randrange(1, 29):02d}]]"
+        if known_ids and rng.random() < ref_density:
+            text += f" (({rng.choice(known_ids)}))"
+            counts['refs'] += 1
+        if assets and rng.random() < 0.02:
+            text += f" ![image](../assets/image_{rng.randrange(assets)}.png)"
+        lines = [f"{indent}- {text}"]
+        if rng.random() < id_ratio:
+            uid = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+            known_ids.append(uid)
+            lines.append(f"{indent}  id:: {uid}")
+            counts['ids'] += 1
+        if rng.random() < 0.05:
+            lines.append(f"{indent}  scheduled:: [[{2023}_{rng.randrange(1, 13):02d}_{rng.randrange(1, 29):02d}]]")
+        if rng.random() < fence_ratio:
+            lines += [f"{indent}  ```python", f"{indent}  # TODO not a task #[[not a tag]]",
+                      f"{indent}  print('{sentence(3)}')", f"{indent}  ```"]
+        counts['blocks'] += 1
+        return lines
+
+    def page_text(with_props):
+        lines = []
+        if with_props:
+            lines.append(f"tags:: {', '.join(rng.sample(tags, min(3, len(tags))))}")
+            lines.append(f"created:: {2023}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}")
+            lines.append('')
+        depth = 0
+        for n in range(max(1, int(rng.expovariate(1 / blocks_per_page)))):
+            if n:
+                depth = max(0, min(depth + rng.choice((-1, 0, 0, 1)), 4))
+            lines += block_lines(depth)
+        return '\n'.join(lines) + '\n'
+
+    def write(rel, text):
+        fp = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        data = text.encode('utf-8')
+        with open(fp, 'wb') as f:
+            f.write(data)
+        counts['bytes'] += len(data)
+
+    for i in range(pages):
+        name = f"{rng.choice(WORDS).title()} {i}"
+        if rng.random() < 0.1:
+            name = f"{rng.choice(WORDS).title()}___{name}"
+        write(os.path.join('pages', name + '.md'), page_text(rng.random() < 0.5))
+        counts['pages'] += 1
+    for day in range(journal_days):
+        year, rest = 2020 + day // 336, day % 336
+        write(os.path.join('journals', f"{year}_{rest // 28 + 1:02d}_{rest % 28 + 1:02d}.md"), page_text(False))
+        counts['journals'] += 1
+    for i in range(assets):
+        fp = os.path.join(root, 'assets', f"image_{i}.png")
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        with open(fp, 'wb') as f:
+            f.write(rng.getrandbits(8 * asset_size).to_bytes(asset_size, 'little') if asset_size else b'')
+        counts['assets'] += 1
+    write(os.path.join('logseq', 'config.edn'), '{:meta/version 1}\n')
+    return counts
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('root')
+    p.add_argument('--pages', type=int, default=1000)
+    p.add_argument('--journal-days', type=int, default=365)
+    p.add_argument('--blocks-per-page', type=int, default=12)
+    p.add_argument('--id-ratio', type=float, default=0.15, help='fraction of blocks with an id:: property')
+    p.add_argument('--ref-density', type=float, default=0.1, help='fraction of blocks with a ((uuid)) reference')
+    p.add_argument('--fence-ratio', type=float, default=0.05, help='fraction of blocks with a code fence')
+    p.add_argument('--tag-cardinality', type=int, default=200)
+    p.add_argument('--assets', type=int, default=20)
+    p.add_argument('--asset-size', type=int, default=64 * 1024, help='bytes per asset')
+    p.add_argument('--seed', type=int, default=0)
+    a = p.parse_args()
+    counts = generate_graph(a.root, a.pages, a.journal_days, a.blocks_per_page, a.id_ratio, a.ref_density,
+                            a.fence_ratio, a.tag_cardinality, a.assets, a.asset_size, a.seed)
+    print(', '.join(f"{k}={v}" for k, v in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
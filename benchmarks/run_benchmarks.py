@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark the migration phases on synthetic graphs
+
+For each requested size this generates a seeded graph (see generate_graph.py),
+then runs the same phases main() runs - copy, read, index and convert -
+timing each one. Results are appended as one JSON object per size so runs
+from different commits can be compared.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import Namespace
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import logseq_to_obsidian as l2o  # noqa: E402
+from generate_graph import generate_graph  # noqa: E402
+
+
+def git_commit():
+    """Return the current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_graph(src, pages, opts):
+    """Index the pages and plan their output paths the way main() does"""
+    graph = l2o.Graph(src, opts)
+    for page in pages:
+        graph.add_page(page)
+    return graph
+
+
+def run_phases(src, out, opts):
+    """Run main()'s phases against src/out and return per-phase wall times in seconds"""
+    phases = {}
+
+    def timed(name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        phases[name] = round(time.perf_counter() - start, 4)
+        return result
+
+    scan = timed('scan', l2o.scan_tree, src, out)
+    timed('copy', lambda: l2o.maybe_copy_tree(src, out, True, scan=scan))
+    pages = timed('read', lambda: [l2o.read_page(e.path) for rel, e in scan['files'] if l2o.is_page(rel)])
+    index = timed('index', build_graph, src, pages, opts)
+    results = timed('convert', lambda: list(l2o.convert_files(src, out, pages, opts, index)))
+    phases['total'] = round(sum(phases.values()), 4)
+    return phases, len(results)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument('--sizes', default='1000,10000,100000', help='comma-separated page counts')
+    p.add_argument('--jobs', type=int, default=1)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--ref-density', type=float, default=0.1)
+    p.add_argument('--fence-ratio', type=float, default=0.05)
+    p.add_argument('--tag-cardinality', type=int, default=500)
+    p.add_argument('--asset-size', type=int, default=64 * 1024)
+    p.add_argument('--work-dir', help='keep generated graphs here and reuse them between runs')
+    p.add_argument('--output', default='bench_results.jsonl', help='JSON lines file to append results to')
+    a = p.parse_args()
+
+    work = a.work_dir or tempfile.mkdtemp(prefix='l2o-bench-')
+    opts = Namespace(frontmatter=True, status_tags=True, strip_properties=True, rename_journals=True,
+                     dry_run=False, jobs=a.jobs)
+    commit = git_commit()
+    try:
+        for size in [int(x) for x in a.sizes.split(',') if x.strip()]:
+            params = {'pages': size, 'journal_days': size // 3, 'ref_density': a.ref_density,
+                      'fence_ratio': a.fence_ratio, 'tag_cardinality': a.tag_cardinality,
+                      'assets': max(1, size // 50), 'asset_size': a.asset_size, 'seed': a.seed}
+            src = os.path.join(work, 'graph-' + '-'.join(f"{v}" for v in params.values()))
+            out = os.path.join(work, f"vault-{size}")
+            if not os.path.isdir(src):
+                generate_graph(src, **params)
+            shutil.rmtree(out, ignore_errors=True)
+            phases, files = run_phases(src, out, opts)
+            record = {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'commit': commit,
+                      'python': platform.python_version(), 'jobs': a.jobs, 'params': params,
+                      'files': files, 'phases': phases,
+                      'files_per_sec': round(files / phases['total'], 1) if phases['total'] else None}
+            with open(a.output, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+            print(f"{size:>7} pages  " + '  '.join(f"{k}={v:.3f}s" for k, v in phases.items()))
+            shutil.rmtree(out, ignore_errors=True)
+    finally:
+        if not a.work_dir:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
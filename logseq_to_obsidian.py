@@ -1,37 +1,96 @@
-import os,re,shutil,argparse,sys,yaml,unicodedata
+import os,posixpath,re,itertools,asyncio,collections,shutil,argparse,sys,unicodedata,json,hashlib,fnmatch,difflib,heapq,functools,time,contextlib,dataclasses,filecmp,stat,urllib.parse,tempfile,sqlite3,threading,weakref
+from concurrent.futures import ProcessPoolExecutor,ThreadPoolExecutor
+try: import fcntl
+except ImportError: fcntl=None
 from datetime import datetime
-def slug(s): s=unicodedata.normalize("NFKD",s).encode("ascii","ignore").decode("ascii"); s=re.sub(r"[\s_]+","-",s.strip()); s=re.sub(r"[^a-zA-Z0-9\/\-]","",s); s=re.sub(r"-+","-",s).strip("-"); return s.lower()
+# compiled pattern table: every regex the converter runs per line or per value lives here
+FENCE_RE=re.compile(r"^\s*```"); BLANK_RE=re.compile(r"^\s*$"); BLOCK_RE=re.compile(r"^\s*[-*]\s")
+PROP_RE=re.compile(r"^\s*([A-Za-z0-9_\-]+)::\s*(.+?)\s*$")
+TASK_RE=re.compile(r"^(\s*[-*]\s+)(TODO|DOING|NOW|LATER|WAITING|CANCELED|CANCELLED|DONE)\s+(.*)$",re.IGNORECASE)
+ID_RE=re.compile(r"^\s*id::\s*([A-Za-z0-9\-\_]+)\s*$",re.MULTILINE)
+REF_RE=re.compile(r"\(\(([a-f0-9\-]{6,})\)\)",re.IGNORECASE)
+# #[[Tag]] | [[YYYY_MM_DD]] | ((uuid)) | [[Page]], rewritten together in one scan of the line
+INLINE_RE=re.compile(r"#\[\[([^\]]+)\]\]|\[\[([0-9]{4})_([0-9]{2})_([0-9]{2})\]\]|\(\(([a-f0-9\-]{6,})\)\)|\[\[([^\[\]|#^]+)\]\]",re.IGNORECASE)
+PAGE_LINK_RE=re.compile(r"\[\[([^\[\]|#^\n]+)\]\]")
+EMBED_RE=re.compile(r"\{\{embed\s+(?:\(\(([a-f0-9\-]{6,})\)\)|\[\[([^\[\]\n]+)\]\])\s*\}\}",re.IGNORECASE)
+# ![alt](../assets/x.png){:width 400} | [label](../assets/x.pdf), rewritten with --referenced-assets
+ASSET_RE=re.compile(r"(!?)\[([^\[\]\n]*)\]\(((?:\.{1,2}/)*assets/[^()\s]+)\)(\{[^{}\n]*\})?"); ASSET_WIDTH_RE=re.compile(r":width\s+([0-9]+)")
+# page properties (title::, alias::) are the property lines before the first block
+PAGE_PROPS_RE=re.compile(r"\A(?:[ \t]*\n)*(?:[ \t]*[A-Za-z0-9_\-]+::.*(?:\n|\Z))+"); ALIAS_RE=re.compile(r"\[\[([^\]]+)\]\]|[^,\s][^,]*")
+UID_JUNK_RE=re.compile(r"[^\w\-]"); CHECKBOX_RE=re.compile(r"\[\s.\]")
+SLUG_SEP_RE=re.compile(r"[\s_]+"); SLUG_JUNK_RE=re.compile(r"[^a-zA-Z0-9\/\-]"); SLUG_DASH_RE=re.compile(r"-+")
+DATE_LINK_RE=re.compile(r"\[\[([0-9]{4})[_\-]([0-9]{2})[_\-]([0-9]{2})\]\]"); DATE_RE=re.compile(r"([0-9]{4})[_\-]([0-9]{2})[_\-]([0-9]{2})")
+NUM_DATE_RE=re.compile(r"([0-9]{4})([_\-])([0-9]{1,2})\2( ?[0-9]{1,2})$")
+MDY_DATE_RE=re.compile(r"([A-Za-z]+)\s+( ?[0-9]{1,2}),\s+([0-9]{4})$"); DMY_DATE_RE=re.compile(r"( ?[0-9]{1,2})\s+([A-Za-z]+)\s+([0-9]{4})$")
+MONTHS={n.lower():i%12+1 for i,n in enumerate("Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec January February March April May June July August September October November December".split())}
+JOURNAL_NAME_RE=re.compile(r"^([0-9]{4})[_\-]([0-9]{2})[_\-]([0-9]{2})$")
+TAG_SPLIT_RE=re.compile(r",|\s{2,}"); TAG_WRAP_RE=re.compile(r"^#\[\[|\]\]$")
+STATUS_TAGS={"DOING":"status/doing","NOW":"status/now","LATER":"status/later","WAITING":"status/waiting","TODO":"status/todo"}
+BLOCK_KEYS=("id","scheduled","deadline","due","created","updated")
+STRIP_KEYS=("id","tags","scheduled","deadline","due","created","updated")
+# title::/alias:: name the page itself; their [[...]] values are names, not links, and are left as written
+NAME_KEYS=("title","alias")
+# tags and dates repeat across a graph; both helpers are pure, so they are memoized (see cache_stats())
+SLUG_CACHE_SIZE=65536; DATE_CACHE_SIZE=8192
+# --inline-embeds reads an embedded page once and keeps its body and block spans for the next embed
+EMBED_CACHE_SIZE=256
+# pages above STREAM_ABOVE bytes are converted line by line (--stream-above); a block's first line is held
+# back for at most STREAM_LOOKBEHIND characters of the block, so later id::/scheduled:: lines are not seen
+STREAM_ABOVE=32<<20; STREAM_LOOKBEHIND=1<<20; STREAM_CHUNK=1<<20; FRONTMATTER_MAX=1<<20
+@functools.lru_cache(maxsize=SLUG_CACHE_SIZE)
+def slug(s): s=unicodedata.normalize("NFKD",s).encode("ascii","ignore").decode("ascii"); s=SLUG_SEP_RE.sub("-",s.strip()); s=SLUG_JUNK_RE.sub("",s); s=SLUG_DASH_RE.sub("-",s).strip("-"); return s.lower()
+@functools.lru_cache(maxsize=None)
+def yaml_codec():
+    # PyYAML is imported on the first page with frontmatter; libyaml's C loader is used when built in. Dumps stay
+    # with the pure SafeDumper: CSafeDumper escapes characters outside the BMP (emoji) even with allow_unicode
+    import yaml
+    return yaml,getattr(yaml,"CSafeLoader",yaml.SafeLoader),yaml.SafeDumper
+def load_yaml(y):
+    # a frontmatter mapping, or None when the block is not one (a YAML error, a list, a bare string)
+    yaml,loader,_=yaml_codec()
+    try: meta=yaml.load(y,Loader=loader) or {}
+    except yaml.YAMLError: return None
+    return meta if isinstance(meta,dict) else None
 def parse_frontmatter(text):
     if text.startswith('---\n'):
         i=text.find('\n---\n',4)
         if i!=-1:
-            y=text[4:i]; b=text[i+5:]
-            try:
-                return (yaml.safe_load(y) or {},b)
-            except yaml.YAMLError:
-                return ({},text)
+            meta=load_yaml(text[4:i])
+            return ({},text) if meta is None else (meta,text[i+5:])
     return ({},text)
-def dump_frontmatter(meta): return '---\n'+yaml.safe_dump(meta,sort_keys=True,allow_unicode=True).strip()+"\n---\n"
+def dump_frontmatter(meta):
+    yaml,_,dumper=yaml_codec()
+    return '---\n'+yaml.dump(meta,Dumper=dumper,sort_keys=True,allow_unicode=True).strip()+"\n---\n"
 def is_code_fence(line,flag):
-    if re.match(r"^\s*```",line): return not flag
+    if FENCE_RE.match(line): return not flag
     return flag
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
 def to_iso_date(s):
+    # dispatch on the shape of the string instead of trying every strptime format
     s=s.strip()
-    m=re.match(r"\[\[([0-9]{4})[_\-]([0-9]{2})[_\-]([0-9]{2})\]\]",s);
+    m=DATE_LINK_RE.match(s)
     if m: return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
-    m=re.match(r"([0-9]{4})[_\-]([0-9]{2})[_\-]([0-9]{2})",s)
+    m=DATE_RE.match(s)
     if m: return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
-    for fmt in ["%Y-%m-%d","%Y_%m_%d","%b %d, %Y","%B %d, %Y","%d %b %Y","%d %B %Y"]:
-        try: return datetime.strptime(s,fmt).strftime("%Y-%m-%d")
-        except: pass
-    return None
+    m=NUM_DATE_RE.match(s)
+    if m: y,mo,d=m.group(1),m.group(3),m.group(4)
+    else:
+        m=MDY_DATE_RE.match(s) or DMY_DATE_RE.match(s)
+        if not m: return None
+        y=m.group(3); name,d=(m.group(1),m.group(2)) if m.re is MDY_DATE_RE else (m.group(2),m.group(1))
+        mo=MONTHS.get(name.lower())
+        if not mo: return None
+    try: return datetime(int(y),int(mo),int(d)).strftime("%Y-%m-%d")
+    except ValueError: return None
+def cache_stats():
+    return {f.__name__:f.cache_info()._asdict() for f in (slug,to_iso_date,page_blocks)}
 def split_list_tags(v):
     parts=[]
-    for x in re.split(r",|\s{2,}",v):
+    for x in TAG_SPLIT_RE.split(v):
         x=x.strip()
         if not x: continue
         if x.startswith("[[") and x.endswith("]]"): x=x[2:-2]
-        if x.startswith("#["): x=re.sub(r"^#\[\[|\]\]$","",x)
+        if x.startswith("#["): x=TAG_WRAP_RE.sub("",x)
         if x.startswith("#"): x=x[1:]
         parts.append(slug(x))
     return [p for p in parts if p]
@@ -40,186 +99,1168 @@ def md_path_title(root,fp):
     if rel.endswith(".md"): rel=rel[:-3]
     return rel.replace("\\","/")
 def hyphen_date_name(name):
-    m=re.match(r"^([0-9]{4})[_\-]([0-9]{2})[_\-]([0-9]{2})$",name);
+    m=JOURNAL_NAME_RE.match(name);
     return f"{m.group(1)}-{m.group(2)}-{m.group(3)}" if m else None
-def convert_file(src_root,out_root,fp,opts,uuid_to_file,anchor_targets):
-    with open(fp,"r",encoding="utf-8") as f: text=f.read()
-    meta,body=parse_frontmatter(text)
-    lines=body.splitlines()
+def tokenize(lines):
+    # classify each line once: (line, in_code, starts_block, (key,value) or None)
     code=False
-    # collect per-file tags from tags:: page-level properties at top
-    page_tags=set()
-    # pass 1: detect id:: for blocks, scheduled/deadline linkages, collect page properties
-    last_block_idx=None; block_props={}
-    for i,line in enumerate(lines):
-        code=is_code_fence(line,code)
-        if code: continue
-        if re.match(r"^\s*$",line): continue
-        if re.match(r"^\s*[-*]\s",line) or not line.startswith((" ","\t")): last_block_idx=i
-        m=re.match(r"^\s*([A-Za-z0-9_\-]+)::\s*(.+?)\s*$",line)
-        if m:
-            k,v=m.group(1).lower(),m.group(2).strip()
-            if k=="tags" and (last_block_idx is None or i<5):
-                page_tags.update(split_list_tags(v));
-            if k in ("id","scheduled","deadline","due","created","updated"):
-                if last_block_idx is not None:
-                    d=block_props.get(last_block_idx,{})
-                    d[k]=v; block_props[last_block_idx]=d
-    # insert ^uuid anchors
-    for idx,props in block_props.items():
+    for line in lines:
+        if FENCE_RE.match(line): code=not code
+        if code: yield line,True,False,None; continue
+        if BLANK_RE.match(line): yield line,False,False,None; continue
+        m=PROP_RE.match(line)
+        yield line,False,bool(BLOCK_RE.match(line)) or not line.startswith((" ","\t")),(m.group(1).lower(),m.group(2).strip()) if m else None
+def task_status(line,status_tags=False):
+    m=TASK_RE.match(line)
+    if not m: return None
+    pre,kw,rest=m.groups(); kw=kw.upper()
+    if kw in ("DONE","CANCELED","CANCELLED"): box="[x]"; tag="status/done" if status_tags else None
+    else: box="[ ]"; tag=STATUS_TAGS.get(kw)
+    if status_tags and tag: rest=(rest+" #"+tag).rstrip()
+    return pre+box+" "+rest
+def block_ids(body): return [(uid,m.start()) for m in ID_RE.finditer(body) for uid in (UID_JUNK_RE.sub("",m.group(1)),) if uid]
+def block_spans(body):
+    # uid -> (start, end) offsets in body of the block declaring it, children included
+    spans={}; opened=[]; pos=0
+    def close(depth):
+        while opened and opened[-1][0]>=depth:
+            _,start,uids=opened.pop()
+            for u in uids: spans[u]=(start,pos)
+    for line,code,block,prop in tokenize(body.splitlines(True)):
+        if prop and prop[0]=="id":
+            if opened: opened[-1][2].append(UID_JUNK_RE.sub("",prop[1]))
+        elif block and not code: close(len(line)-len(line.lstrip(" \t"))); opened.append((len(line)-len(line.lstrip(" \t")),pos,[]))
+        pos+=len(line)
+    close(0); return spans
+@functools.lru_cache(maxsize=EMBED_CACHE_SIZE)
+def page_blocks(fp,mtime,size):
+    # (body, block spans) of an embedded page; mtime and size key the cache, so edits are picked up
+    if size>STREAM_ABOVE: return None
+    with open(fp,"r",encoding="utf-8") as f: body=parse_frontmatter(f.read())[1]
+    return body,block_spans(body)
+def read_page(fp,stream_above=None):
+    # the one read of a page: raw text, parsed frontmatter, body and (uuid, offset) of its id:: lines
+    with open(fp,"r",encoding="utf-8") as f:
+        size=os.fstat(f.fileno()).st_size
+        if size>(STREAM_ABOVE if stream_above is None else stream_above): return scan_page(f,fp,size)
+        text=f.read()
+    meta,body=parse_frontmatter(text)
+    return {"fp":fp,"text":text,"meta":meta,"body":body,"ids":block_ids(body),"names":page_names(fp,meta,body),"size":size}
+def scan_page(f,fp,size):
+    # read_page for a large page: one pass that keeps no text, only what the index and manifest need
+    # (text and body are None); convert_file streams the body again, skipping the frontmatter lines
+    h=hashlib.sha1(); meta={}; skip=0; ids=[]; refs=set(); head=[]; offset=0
+    first=f.readline(); body=[first]
+    if first=="---\n":
+        # the same rule as parse_frontmatter: a closing "---" line after at least one YAML line
+        n=0
+        for line in f:
+            body.append(line); n+=len(line)
+            if line=="---\n" and len(body)>2:
+                y=load_yaml("".join(body[1:-1])[:-1])
+                if y is not None: meta=y; skip=len(body)
+                break
+            if n>FRONTMATTER_MAX: break
+        for line in body[:skip]: h.update(line.encode("utf-8"))
+    n=0
+    for line in itertools.chain(body[skip:],f):
+        h.update(line.encode("utf-8"))
+        if n<65536: head.append(line); n+=len(line)
+        if "id::" in line: ids.extend((u,offset+o) for u,o in block_ids(line))
+        if "((" in line or "[[" in line or "assets/" in line: refs|=body_refs(line)
+        offset+=len(line)
+    return {"fp":fp,"text":None,"meta":meta,"body":None,"ids":ids,"names":page_names(fp,meta,"".join(head)),"size":size,
+            "sha1":h.hexdigest(),"refs":sorted(refs),"skip":skip,"front":"".join(body[:skip])}
+def stream_lines(fp,skip=0):
+    # a page's body lines as body.splitlines() gives them, read a line at a time
+    with open(fp,"r",encoding="utf-8") as f:
+        for n,line in enumerate(f):
+            if n>=skip: yield from line.splitlines()
+def file_title(fp):
+    # Logseq encodes "Project/Sub Page" as Project___Sub Page.md (or Project%2FSub Page.md in older graphs)
+    name=os.path.basename(fp); name=name[:-3] if name.lower().endswith(".md") else name
+    name=name.replace("___","/")
+    return urllib.parse.unquote(name) if "%" in name else name
+def page_names(fp,meta,body):
+    # the page's name (title::, else decoded from its file name) followed by its aliases
+    props={}
+    m=PAGE_PROPS_RE.match(body)
+    if m:
+        for line in m.group(0).splitlines():
+            pm=PROP_RE.match(line)
+            if pm: props.setdefault(pm.group(1).lower(),pm.group(2).strip())
+    if not isinstance(meta,dict): meta={}
+    title=props.get("title") or meta.get("title")
+    names=[title.strip() if isinstance(title,str) and title.strip() else file_title(fp)]
+    for v in (props.get("alias"),meta.get("alias"),meta.get("aliases")):
+        for a in (v if isinstance(v,list) else [m.group(1) or m.group(0) for m in ALIAS_RE.finditer(v)] if isinstance(v,str) else ()):
+            if isinstance(a,str) and a.strip() and a.strip() not in names: names.append(a.strip())
+    return tuple(names)
+def body_refs(body):
+    # ((uuid)) targets, "[[name" page links and "!name" asset basenames (asset links resolve by file name)
+    refs=set(REF_RE.findall(body))|{"[["+n.strip().lower() for n in PAGE_LINK_RE.findall(body)}
+    if "assets/" in body: refs|={"!"+urllib.parse.unquote(m.group(3)).rsplit("/",1)[-1].lower() for m in ASSET_RE.finditer(body)}
+    return refs
+def page_refs(page):
+    # what a page's output depends on besides itself: ((uuid)) targets and "[[name" page links
+    return page["refs"] if page["body"] is None else sorted(body_refs(page["body"]))
+@dataclasses.dataclass
+class ConversionOptions:
+    # switches that change what a page converts to; an argparse namespace with the same names also works
+    frontmatter: bool=False
+    status_tags: bool=False
+    strip_properties: bool=False
+    rename_journals: bool=False
+    full_link_paths: bool=False
+    referenced_assets: bool=False
+    inline_embeds: bool=False
+    @classmethod
+    def from_args(cls,args): return cls(**{f.name:bool(getattr(args,f.name,False)) for f in dataclasses.fields(cls)})
+def link_name(dest): return os.path.basename(dest[:-3] if dest.endswith(".md") else dest).lower()
+def uid_key(uid):
+    # canonical lower-case UUIDs are indexed by their 16 bytes; short or unusual ids stay strings
+    if len(uid)==36 and uid[8]==uid[13]==uid[18]==uid[23]=="-" and uid==uid.lower():
+        try: return bytes.fromhex(uid.replace("-",""))
+        except ValueError: pass
+    return uid
+def key_uid(key):
+    if not isinstance(key,bytes): return key
+    h=key.hex(); return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+def pack_keys(keys):
+    # a spilled index keeps each page's ids as one blob when they are all 16-byte keys
+    return b"".join(keys) if all(isinstance(k,bytes) for k in keys) else tuple(keys)
+def unpack_keys(keys): return [keys[i:i+16] for i in range(0,len(keys),16)] if isinstance(keys,bytes) else keys
+def _drop_index(db,path):
+    db.close()
+    if os.path.exists(path): os.unlink(path)
+class SpilledIds:
+    # the uid key -> file number map as a SQLite table in a temp file (--index-spill); --jobs workers reopen it read-only
+    def __init__(self,items=()):
+        fd,self.path=tempfile.mkstemp(prefix="l2o-index-",suffix=".sqlite"); os.close(fd)
+        self._connect(); self.db.execute("PRAGMA journal_mode=OFF"); self.db.execute("PRAGMA synchronous=OFF")
+        self.db.execute("CREATE TABLE ids (k PRIMARY KEY, f INTEGER) WITHOUT ROWID")
+        self.db.executemany("INSERT INTO ids VALUES (?,?)",items)
+        weakref.finalize(self,_drop_index,self.db,self.path)
+    def _connect(self,uri=None):
+        self.db=sqlite3.connect(uri or self.path,uri=bool(uri),check_same_thread=False); self.lock=threading.Lock()
+    def __getstate__(self):
+        self.db.commit(); return {"path":self.path}
+    def __setstate__(self,state): self.path=state["path"]; self._connect(f"file:{self.path}?mode=ro")
+    def _one(self,sql,args=()):
+        with self.lock: return self.db.execute(sql,args).fetchone()
+    def get(self,k,default=None):
+        row=self._one("SELECT f FROM ids WHERE k=?",(k,))
+        return default if row is None else row[0]
+    def claim(self,keys,f):
+        # insert a page's keys in one statement, returning those another page already declares
+        with self.lock:
+            before=self.db.total_changes; self.db.executemany("INSERT OR IGNORE INTO ids VALUES (?,?)",[(k,f) for k in keys])
+            if self.db.total_changes-before==len(keys): return []
+        return [k for k in keys if self.get(k)!=f]
+    def __setitem__(self,k,f):
+        with self.lock: self.db.execute("INSERT OR REPLACE INTO ids VALUES (?,?)",(k,f))
+    def __delitem__(self,k):
+        with self.lock: self.db.execute("DELETE FROM ids WHERE k=?",(k,))
+    def __contains__(self,k): return self.get(k) is not None
+    def __len__(self): return self._one("SELECT count(*) FROM ids")[0]
+    def __iter__(self):
+        with self.lock: keys=[k for k, in self.db.execute("SELECT k FROM ids")]
+        return iter(keys)
+class Graph:
+    # UUID index of a graph: block id -> the page declaring it; the first page declaring an id wins, as in a full walk.
+    # Pages are interned as file numbers (files[n] is a graph-relative path such as "pages/Sample Page.md") and
+    # UUIDs are keyed by their 16 bytes (see uid_key), so a million-block index stays small; past spill ids
+    # (--index-spill) the map moves to SQLite on disk. Pages can be added and removed to keep a long-lived index current.
+    # paths maps every page to its vault path (journal renames applied), so links and writes agree up front;
+    # names maps a lower-cased vault basename to the pages sharing it, so links can use the shortest unique form;
+    # titles maps a lower-cased page name (title::, namespace or alias) to (rank, page), names outranking aliases;
+    # assets holds the graph's other files and asset_names counts their lower-cased basenames;
+    # texts holds the (body, block spans) of pages given by add_text, so their embeds are inlined without reading disk.
+    def __init__(self,root=None,opts=None):
+        self.root=root; self.rename_journals=bool(getattr(opts,"rename_journals",False)); self.full_link_paths=bool(getattr(opts,"full_link_paths",False))
+        self.spill=getattr(opts,"index_spill",0) or 0
+        self.ids={}; self.files=[]; self.file_no={}; self.page_ids={}; self.paths={}; self.names={}; self.titles={}; self.page_names={}; self._dupes=set()
+        self.assets=set(); self.asset_names=collections.Counter(); self.texts={}
+    @classmethod
+    def load(cls,root,exclude=(),opts=None):
+        g=cls(os.path.abspath(root),opts)
+        for fp in md_files(g.root,None,exclude,getattr(opts,"io_concurrency",1)): g.add_page(read_page(fp,getattr(opts,"stream_above",None)))
+        return g
+    def rel(self,path): return (os.path.relpath(path,self.root) if self.root and os.path.isabs(path) else path).replace("\\","/")
+    def add_page(self,page): self.add(page["fp"],[u for u,_ in page["ids"]],page["names"])
+    def add_text(self,path,text):
+        meta,body=parse_frontmatter(text); self.add(path,[u for u,_ in block_ids(body)],page_names(path,meta,body))
+        self.texts[self.rel(path)]=(body,None)
+    def add(self,path,ids,names=None):
+        path=self.rel(path); self.remove(path); self.paths[path]=self.output_path(path)
+        no=self.file_no.get(path)
+        if no is None: no=self.file_no[path]=len(self.files); self.files.append(path)
+        self.names.setdefault(link_name(self.paths[path]),set()).add(path)
+        keys=tuple(uid_key(u) for u in ids)
+        if isinstance(self.ids,dict): self._dupes.update(k for k in keys if self.ids.setdefault(k,no)!=no)
+        else: self._dupes.update(self.ids.claim(keys,no))
+        if isinstance(self.ids,dict):
+            self.page_ids[path]=keys
+            if self.spill and len(self.ids)>self.spill:
+                self.ids=SpilledIds(self.ids.items()); self.page_ids={p:pack_keys(ks) for p,ks in self.page_ids.items()}
+        else: self.page_ids[path]=pack_keys(keys)
+        self.page_names[path]=keys=tuple(dict.fromkeys(n.lower() for n in (names or (file_title(path),))))
+        for rank,key in enumerate(keys):
+            rank=min(rank,1); cur=self.titles.get(key)
+            if cur is None or rank<cur[0]: self.titles[key]=(rank,path)
+            if cur is not None: self._dupes.add("[["+key)
+    def remove(self,path):
+        path=self.rel(path); dest=self.paths.pop(path,None); no=self.file_no.get(path); self.texts.pop(path,None)
+        same=self.names.get(link_name(dest)) if dest is not None else None
+        if same is not None:
+            same.discard(path)
+            if not same: del self.names[link_name(dest)]
+        for k in unpack_keys(self.page_ids.pop(path,())):
+            if self.ids.get(k)!=no: continue
+            del self.ids[k]
+            if k in self._dupes:
+                for other,keys in self.page_ids.items():
+                    if k in unpack_keys(keys): self.ids[k]=self.file_no[other]; break
+        for key in self.page_names.pop(path,()):
+            if self.titles.get(key,(0,None))[1]!=path: continue
+            del self.titles[key]
+            if "[["+key in self._dupes:
+                for other,keys in self.page_names.items():
+                    if key in keys:
+                        rank=min(keys.index(key),1)
+                        if key not in self.titles or rank<self.titles[key][0]: self.titles[key]=(rank,other)
+    def add_asset(self,path):
+        path=self.rel(path)
+        if path not in self.assets: self.assets.add(path); self.asset_names[path.rsplit("/",1)[-1].lower()]+=1
+    def remove_asset(self,path):
+        path=self.rel(path)
+        if path in self.assets: self.assets.discard(path); self.asset_names[path.rsplit("/",1)[-1].lower()]-=1
+    def asset_target(self,page,href):
+        # ../assets/x.png as written in page -> (graph-relative asset, link text), or None when there is no such file
+        href=urllib.parse.unquote(href)
+        for rel in (posixpath.normpath(posixpath.join(posixpath.dirname(self.rel(page)),href)),posixpath.normpath(href.lstrip("./"))):
+            if rel in self.assets:
+                name=rel.rsplit("/",1)[-1]
+                return rel,rel if self.full_link_paths or self.asset_names[name.lower()]>1 else name
+        return None
+    def embed_source(self,ref):
+        # "[[name" -> (page, its body below the page properties); uid -> (page, the block's text with its children)
+        if ref.startswith("[["): hit=self.titles.get(ref[2:].strip().lower()); rel=hit and hit[1]
+        else: no=self.ids.get(uid_key(ref)); rel=None if no is None else self.files[no]
+        if rel is None: return None
+        blocks=self.texts.get(rel)
+        if blocks is not None and blocks[1] is None: blocks=self.texts[rel]=(blocks[0],block_spans(blocks[0]))
+        elif blocks is None:
+            fp=os.path.join(self.root,rel) if self.root else rel
+            try: st=os.stat(fp); blocks=page_blocks(fp,st.st_mtime_ns,st.st_size)
+            except OSError: return None
+            if blocks is None: return None
+        body,spans=blocks
+        if ref.startswith("[["): m=PAGE_PROPS_RE.match(body); return rel,body[m.end():] if m else body
+        span=spans.get(ref)
+        return None if span is None else (rel,body[span[0]:span[1]])
+    def __contains__(self,uid): return uid_key(uid) in self.ids
+    def __len__(self): return len(self.ids)
+    def uids(self): return [key_uid(k) for k in self.ids]
+    def page_uids(self,path): return [key_uid(k) for k in unpack_keys(self.page_ids.get(self.rel(path),()))]
+    def footprint(self):
+        # approximate size of the uuid index for --stats: keys, file table and per-page id lists
+        size=sys.getsizeof; spilled=not isinstance(self.ids,dict)
+        mem=size(self.files)+sum(size(p) for p in self.files)+size(self.file_no)+size(self.page_ids)+sum(size(t) for t in self.page_ids.values())
+        if not spilled: mem+=size(self.ids)+sum(size(k) for k in self.ids)
+        else: self.ids.db.commit()
+        return {"backend":"sqlite" if spilled else "memory","uuids":len(self.ids),"pages":len(self.page_ids),
+                "memory_bytes":mem,"disk_bytes":os.path.getsize(self.ids.path) if spilled else 0}
+    def output_path(self,path):
+        rel=self.rel(path); dest=self.paths.get(rel)
+        if dest is None: dest=journal_name(rel) if self.rename_journals and rel.lower().endswith(".md") else rel
+        return dest
+    def namesakes(self,path): return self.names.get(link_name(self.output_path(path)),set())
+    def link_target(self,path):
+        # Obsidian resolves a bare basename when it is unique in the vault; collisions keep the full path
+        rel=self.output_path(path); title=rel[:-3] if rel.endswith(".md") else rel
+        return title if self.full_link_paths or len(self.names.get(link_name(rel),()))>1 else title.rsplit("/",1)[-1]
+    def link_title(self,uid):
+        no=self.ids.get(uid_key(uid))
+        return None if no is None else self.link_target(self.files[no])
+    def page_link(self,name):
+        # [[name]] -> link text for its page, or None when Obsidian already resolves name to that page
+        hit=self.titles.get(name.strip().lower())
+        if hit is None: return None
+        dest=self.paths[hit[1]]
+        if name.strip().lower()==link_name(dest) and len(self.names[link_name(dest)])==1: return None
+        return self.link_target(hit[1])
+    def target(self,ref): return self.page_link(ref[2:]) if ref.startswith("[[") else self.link_title(ref)
+    def convert(self,text,path,opts=None): return convert_text(text,path,self,opts)
+def _resolver(index,root=None,used=None):
+    # (uid -> link title, page name -> link text, (page, asset href) -> link text, embed -> source) from a Graph,
+    # adding the graph-relative assets that resolve to used; a plain {uuid: page path} mapping (absolute paths
+    # need root) resolves block refs only
+    none=lambda *key: None
+    if index is None: return none,none,none,none
+    if isinstance(index,Graph):
+        def asset(page,href):
+            hit=index.asset_target(page,href)
+            if hit is None: return None
+            if used is not None: used.add(hit[0])
+            return hit[1]
+        return index.link_title,index.page_link,asset,index.embed_source
+    def resolve(uid):
+        fp=index.get(uid)
+        if fp is None: return None
+        return md_path_title(root,fp) if root else fp[:-3] if fp.endswith(".md") else fp
+    return resolve,none,none,none
+def convert_text(text,path,index=None,opts=None):
+    # pure conversion of one page; path is only used for its file name (journal dates)
+    meta,body=parse_frontmatter(text)
+    return _convert(text,meta,body,path,opts or ConversionOptions(),_resolver(index))
+def convert_lines(lines,path,opts,resolve,state,lookbehind=None,embedding=frozenset()):
+    # the single pass over a page body, yielding output lines; page tags and the first block date
+    # are collected in state for page_header; embedding holds the blocks and pages being inlined around it
+    block_title,page_link,asset_link,embed_source=resolve
+    assets=getattr(opts,"referenced_assets",False); inline_embeds=getattr(opts,"inline_embeds",False)
+    # convert #[[Tag With Spaces]] → #tag-with-spaces ; [[YYYY_MM_DD]] → [[YYYY-MM-DD]] ; ((uuid)) → [[path#^uuid]] ;
+    # [[Project/Sub Page]] → [[Project___Sub Page|Project/Sub Page]] when the name alone would not resolve
+    def repl(m):
+        k=m.lastindex
+        if k==1: return "#"+slug(m.group(1))
+        if k==4: return f"[[{m.group(2)}-{m.group(3)}-{m.group(4)}]]"
+        if k==6:
+            target=page_link(m.group(6))
+            return m.group(0) if target is None else f"[[{target}|{m.group(6)}]]"
+        uid=m.group(5); title=block_title(uid)
+        return m.group(0) if title is None else f"[[{title}#^{uid}]]"
+    # ![alt](../assets/x.png){:width 400} → ![[x.png|400]] ; [label](../assets/x.pdf) → [[x.pdf|label]]
+    def asset_repl(m):
+        name=asset_link(path,m.group(3))
+        if name is None: return m.group(0)
+        if m.group(1):
+            w=ASSET_WIDTH_RE.search(m.group(4) or "")
+            return f"![[{name}|{w.group(1)}]]" if w else f"![[{name}]]"
+        return f"[[{name}|{m.group(2)}]]" if m.group(2) and m.group(2)!=name.rsplit("/",1)[-1] else f"[[{name}]]"
+    # {{embed ((uuid))}} → ![[page#^uuid]] ; {{embed [[Page]]}} → ![[Page]], its link then rewritten as above.
+    # With --inline-embeds the block (or page) is converted in place instead: its first line replaces the
+    # macro and its children follow the line, nested under it; an embed already being inlined stays a link
+    def embed(m,indent,parts,extra):
+        uid,name=m.group(1),m.group(2)
+        hit=embed_source(uid or "[["+name) if inline_embeds else None
+        key=uid or hit and "[["+hit[0]
+        if hit is None or key in embedding:
+            if name: return "![["+name+"]]"
+            title=block_title(uid)
+            return m.group(0) if title is None else f"![[{title}#^{uid}]]"
+        lines=convert_lines([l for l in hit[1].splitlines() if not ID_RE.match(l)],hit[0],opts,resolve,{"tags":set(),"date":None},None,embedding|{key})
+        out=[l for chunk in lines for l in chunk.split("\n") if l.strip()]
+        if not out: return ""
+        if name:
+            unit="  " if indent.startswith(" ") or any(l.startswith(" ") for l in out) else "\t"; base=out[0][:len(out[0])-len(out[0].lstrip(" \t"))]
+            extra.extend(indent+unit+l[len(base):] if l.startswith(base) else l for l in out); return "[["+name+"]]"
+        base=out[0][:len(out[0])-len(out[0].lstrip(" \t"))]
+        extra.extend(indent+l[len(base):] if l.startswith(base) else l for l in out[1:])
+        # the converted first line is put back after the rewrite pass, so it is not rewritten twice
+        parts.append(BLOCK_RE.sub("",out[0],count=1)); return f"\0{len(parts)-1}\0"
+    def inline(line):
+        parts=[]; extra=[]
+        if "{{" in line: line=EMBED_RE.sub(lambda m: embed(m,line[:len(line)-len(line.lstrip(" \t"))],parts,extra),line)
+        if assets and "](" in line: line=ASSET_RE.sub(asset_repl,line)
+        if "[[" in line or "((" in line: line=INLINE_RE.sub(repl,line)
+        for i,part in enumerate(parts): line=line.replace(f"\0{i}\0",part)
+        return "\n".join([line]+extra) if extra else line
+    # a block's start line is held back until its id::/scheduled:: children have been seen
+    def finish_block(i,line,props):
         if "id" in props:
-            uid=re.sub(r"[^\w\-]","",props["id"])
-            if uid:
-                anchor_targets[uid]=(fp,idx)
-                if "^"+uid not in lines[idx]: lines[idx]=lines[idx].rstrip()+" ^"+uid
-    # convert tasks + scheduled/deadline to Tasks syntax and TODO/DONE → checkboxes
-    def task_status(line):
-        m=re.match(r"^(\s*[-*]\s+)(TODO|DOING|NOW|LATER|WAITING|CANCELED|CANCELLED|DONE)\s+(.*)$",line,flags=re.IGNORECASE)
-        if not m: return None
-        pre,kw,rest=m.groups(); kw=kw.upper()
-        if kw in ("DONE","CANCELED","CANCELLED"): box="[x]"; tag="status/done" if opts.status_tags else None
-        else: box="[ ]"; tag={"DOING":"status/doing","NOW":"status/now","LATER":"status/later","WAITING":"status/waiting","TODO":"status/todo"}.get(kw)
-        if opts.status_tags and tag: rest=(rest+" #"+tag).rstrip()
-        return pre+box+" "+rest
-    for i in range(len(lines)):
-        code=is_code_fence(lines[i],code)
-        if code: continue
-        ts=task_status(lines[i])
-        if ts: lines[i]=ts
-        if i in block_props:
-            bp=block_props[i]
-            for key,icon in (("scheduled","⏳"),("deadline","📅"),("due","📅")):
-                if key in bp:
-                    iso=to_iso_date(bp[key])
-                    if iso and re.search(r"\[\s.\]",lines[i]):
-                        if f"{icon} " not in lines[i]: lines[i]=lines[i].rstrip()+f" {icon} {iso}"
-    # convert #[[Tag With Spaces]] → #tag-with-spaces ; [[YYYY_MM_DD]] → [[YYYY-MM-DD]]
-    for i in range(len(lines)):
-        code=is_code_fence(lines[i],code)
-        if code: continue
-        def repl_tag(m): return "#"+slug(m.group(1))
-        lines[i]=re.sub(r"#\[\[([^\]]+)\]\]",repl_tag,lines[i])
-        lines[i]=re.sub(r"\[\[([0-9]{4})_([0-9]{2})_([0-9]{2})\]\]",r"[[\1-\2-\3]]",lines[i])
-    # rewrite ((uuid)) → [[path#^uuid]]
-    def replace_block_refs(line):
-        def repl(m):
-            uid=m.group(1)
-            if uid in uuid_to_file:
-                tfile=uuid_to_file[uid]
-                title=md_path_title(out_root or src_root,tfile)
-                return f"[[{title}#^{uid}]]"
-            return m.group(0)
-        return re.sub(r"\(\(([a-f0-9\-]{6,})\)\)",repl,line,flags=re.IGNORECASE)
-    for i in range(len(lines)):
-        code=is_code_fence(lines[i],code)
-        if code: continue
-        lines[i]=replace_block_refs(lines[i])
-    # page-level tags → YAML tags
+            uid=UID_JUNK_RE.sub("",props["id"])
+            if uid and "^"+uid not in line: line=line.rstrip()+" ^"+uid
+        ts=task_status(line,opts.status_tags)
+        if ts: line=ts
+        for key,icon in (("scheduled","⏳"),("deadline","📅"),("due","📅")):
+            if key in props:
+                iso=to_iso_date(props[key])
+                if iso and CHECKBOX_RE.search(line):
+                    if f"{icon} " not in line: line=line.rstrip()+f" {icon} {iso}"
+        return line if held_name else inline(line)
+    # file-level date from the first block with a created::/updated:: date, unless the page already has one
+    def block_date(props):
+        for k in ("created","updated"):
+            if k in props:
+                iso=to_iso_date(props[k])
+                if iso: return iso
+    want_date=opts.frontmatter and not state["date"]
+    held=[]; pending=None; held_name=False; props={}; size=0; last_block_idx=None
+    for i,(line,code,block,prop) in enumerate(tokenize(lines)):
+        if block:
+            if pending is not None: held[0]=finish_block(pending,held[0],props); yield from held
+            if want_date and props: state["date"]=block_date(props); want_date=not state["date"]
+            held=[]; pending=None; props={}; last_block_idx=i
+        if not code:
+            if prop:
+                k,v=prop
+                # collect per-file tags from tags:: page-level properties at top
+                if k=="tags" and (last_block_idx is None or i<5): state["tags"].update(split_list_tags(v))
+                if k in BLOCK_KEYS and last_block_idx is not None: props[k]=v
+                if opts.strip_properties and k in STRIP_KEYS: continue
+            named=bool(prop) and prop[0] in NAME_KEYS
+            if block: pending=i; held=[line]; held_name=named; size=len(line); continue
+            if not named: line=inline(line)
+        if pending is None: yield line; continue
+        held.append(line); size+=len(line)
+        if lookbehind and size>lookbehind: held[0]=finish_block(pending,held[0],props); yield from held; held=[]; pending=None
+    if pending is not None: held[0]=finish_block(pending,held[0],props); yield from held
+    if want_date and props: state["date"]=block_date(props)
+def page_state(meta,path,opts):
+    # file-level date for journals or existing created::, before any block date
+    d=None
     if opts.frontmatter:
-        if page_tags:
-            mtags=set([slug(t) for t in page_tags if t])
-            old=set(meta.get("tags",[])) if isinstance(meta.get("tags"),list) else set()
-            meta["tags"]=sorted(old.union(mtags))
-        # file-level date for journals or existing created::
-        base=os.path.splitext(os.path.basename(fp))[0]
-        d=hyphen_date_name(base)
+        d=hyphen_date_name(os.path.splitext(os.path.basename(path))[0])
         if not d:
             for k in ("date","created","updated"):
                 if k in meta and isinstance(meta[k],str) and to_iso_date(meta[k]): d=to_iso_date(meta[k]); break
-        if not d and any(k in block_props.get(i,{}) for i in block_props for k in ("created","updated")):
-            for i in block_props:
-                for k in ("created","updated"):
-                    if k in block_props[i]:
-                        iso=to_iso_date(block_props[i][k])
-                        if iso: d=iso; break
-                if d: break
-        if d: meta["date"]=d
-    # optionally strip properties lines we converted
-    if opts.strip_properties:
-        new=[]
-        code=False
-        for i,line in enumerate(lines):
-            code=is_code_fence(line,code)
-            if code: new.append(line); continue
-            m=re.match(r"^\s*([A-Za-z0-9_\-]+)::\s*(.+?)\s*$",line)
-            if m and m.group(1).lower() in ("id","tags","scheduled","deadline","due","created","updated"):
-                continue
-            new.append(line)
-        lines=new
-    body="\n".join(lines).rstrip()+"\n"
-    out_text=(dump_frontmatter(meta)+body) if opts.frontmatter and meta else (body if not text.startswith('---\n') else '---\n'+yaml.safe_dump(meta,sort_keys=True,allow_unicode=True).strip()+"\n---\n"+body)
-    out_fp=fp
-    if opts.out:
-        out_fp=os.path.join(opts.out,os.path.relpath(fp,src_root)); os.makedirs(os.path.dirname(out_fp),exist_ok=True)
-    if opts.dry_run: return {"out":out_fp,"changed":out_text!=text}
-    with open(out_fp,"w",encoding="utf-8") as f: f.write(out_text)
-    return {"out":out_fp,"changed":out_text!=text}
-def build_uuid_index(src_root):
-    idx={}
-    for root,_,files in os.walk(src_root):
-        for fn in files:
-            if not fn.lower().endswith(".md"): continue
-            fp=os.path.join(root,fn)
-            try:
-                with open(fp,"r",encoding="utf-8") as f: text=f.read()
-            except: continue
-            _,body=parse_frontmatter(text)
-            for m in re.finditer(r"^\s*id::\s*([A-Za-z0-9\-\_]+)\s*$",body,flags=re.MULTILINE):
-                uid=re.sub(r"[^\w\-]","",m.group(1))
-                if uid and uid not in idx: idx[uid]=fp
-    return idx
-def maybe_copy_tree(src,out):
-    if not out: return
-    if os.path.abspath(src)==os.path.abspath(out): return
-    if os.path.exists(out): 
-        # If output exists, copy files from src to out
-        for root, dirs, files in os.walk(src):
-            rel_path = os.path.relpath(root, src)
-            out_dir = os.path.join(out, rel_path)
-            os.makedirs(out_dir, exist_ok=True)
-            for file in files:
-                src_file = os.path.join(root, file)
-                out_file = os.path.join(out_dir, file)
-                if not os.path.exists(out_file):
-                    shutil.copy2(src_file, out_file)
-    else: 
-        shutil.copytree(src,out,dirs_exist_ok=True)
-def rename_journals(out_root,opts):
-    if not opts.rename_journals: return []
-    renames=[]
-    for root,_,files in os.walk(out_root):
-        for fn in files:
-            if not fn.lower().endswith(".md"): continue
-            base=fn[:-3]; new=hyphen_date_name(base)
-            if new and new!=base:
-                src=os.path.join(root,fn); dst=os.path.join(root,new+".md")
-                if opts.dry_run: renames.append((src,dst))
-                else: os.rename(src,dst); renames.append((src,dst))
-    return renames
+    return {"tags":set(),"date":d}
+def page_header(meta,opts,state,front=""):
+    # page-level tags → YAML tags; front: the source page's parsed frontmatter block, written back as it was
+    # when no key changes. A "---" block that is not a YAML mapping stays in the body and gets no header of its own
+    before=dict(meta)
+    if opts.frontmatter:
+        if state["tags"]:
+            mtags=set([slug(t) for t in state["tags"] if t])
+            old=set(meta.get("tags",[])) if isinstance(meta.get("tags"),list) else set()
+            meta["tags"]=sorted(old.union(mtags))
+        if state["date"]: meta["date"]=state["date"]
+    if front and meta==before: return front
+    return dump_frontmatter(meta) if (opts.frontmatter and meta) or front else ""
+def _convert(text,meta,body,path,opts,resolve):
+    state=page_state(meta,path,opts); front=text[:len(text)-len(body)]
+    body="\n".join(convert_lines(body.splitlines(),path,opts,resolve,state)).rstrip()+"\n"
+    return page_header(meta,opts,state,front)+body
+# output is written through a temp file renamed over the page, and not at all when the page already holds it,
+# so reruns leave unchanged pages (and their mtimes) alone
+def holds(fp,data):
+    # does fp already contain exactly data? size first, then the bytes a chunk at a time
+    try:
+        with open(fp,"rb") as f:
+            if os.fstat(f.fileno()).st_size!=len(data): return False
+            view=memoryview(data); i=0
+            for chunk in iter(lambda: f.read(STREAM_CHUNK),b""):
+                if view[i:i+len(chunk)]!=chunk: return False
+                i+=len(chunk)
+            return True
+    except OSError: return False
+def replace_output(tmp,out_fp,compare=True):
+    # the temp file takes over out_fp (and its permissions); -> False when out_fp already had the same bytes.
+    # compare=False: the caller has already found out_fp different
+    try: st=os.stat(out_fp)
+    except OSError: st=None
+    if st and compare and filecmp.cmp(tmp,out_fp,shallow=False): os.unlink(tmp); return False
+    if st: os.chmod(tmp,stat.S_IMODE(st.st_mode))
+    os.replace(tmp,out_fp); return True
+def write_output(out_fp,text):
+    # -> bytes written, 0 when out_fp already holds text
+    data=(text if os.linesep=="\n" else text.replace("\n",os.linesep)).encode("utf-8")
+    if holds(out_fp,data): return 0
+    tmp=out_fp+".l2o-tmp"
+    try:
+        with open(tmp,"wb") as f: f.write(data)
+        replace_output(tmp,out_fp,compare=False)
+    finally:
+        if os.path.lexists(tmp): os.unlink(tmp)
+    return len(data)
+def fsync_outputs(paths):
+    # --fsync: flush every file written in a run, then each of their directories once, as one group at the end
+    for fp in sorted(paths)+sorted({os.path.dirname(fp) for fp in paths}):
+        try: fd=os.open(fp,os.O_RDONLY)
+        except OSError: continue
+        try: os.fsync(fd)
+        except OSError: pass
+        finally: os.close(fd)
+def write_body(lines,write):
+    # "\n".join(lines).rstrip()+"\n" in pieces: trailing whitespace is held back until more text follows
+    held=""; first=True
+    for line in lines:
+        s=line if first else "\n"+line; first=False; t=s.rstrip()
+        if not t: held+=s; continue
+        write(held+t); held=s[len(t):]
+    write("\n")
+def convert_stream(page,out_fp,opts,resolve):
+    # convert a page scanned by scan_page without holding it: lines are converted and written as they are read,
+    # through a temp file renamed over out_fp unless out_fp already matches; returns (sha1, bytes, bytes written),
+    # sha1 None when a --dry-run only knows the page changed
+    fp=page["fp"]; meta=dict(page["meta"]); state=page_state(meta,fp,opts); h=hashlib.sha1(); n=[0]; written=0; same=True
+    lines=convert_lines(stream_lines(fp,page["skip"]),fp,opts,resolve,state,STREAM_LOOKBEHIND)
+    tmp=None if opts.dry_run else out_fp+".l2o-tmp"
+    if tmp: os.makedirs(os.path.dirname(out_fp),exist_ok=True)
+    try:
+        with open(tmp,"w",encoding="utf-8") if tmp else contextlib.nullcontext() as out:
+            def emit(chunk):
+                b=chunk.encode("utf-8"); h.update(b); n[0]+=len(b)
+                if out: out.write(chunk)
+            if opts.frontmatter and not out:
+                # a dry run writes nothing, not even a spool: the body is hashed after the page's own frontmatter,
+                # which is the output's sha1 when the header comes out the same and a changed page otherwise
+                h.update(page["front"].encode("utf-8")); write_body(lines,emit)
+                header=page_header(meta,opts,state,page["front"]); n[0]+=len(header.encode("utf-8")); same=header==page["front"]
+            elif opts.frontmatter:
+                # tags and dates can come from anywhere in the body, so it is spooled until the header is known
+                with tempfile.TemporaryFile("w+",encoding="utf-8",dir=os.path.dirname(out_fp)) as spool:
+                    write_body(lines,spool.write); emit(page_header(meta,opts,state,page["front"])); spool.seek(0)
+                    for chunk in iter(lambda: spool.read(STREAM_CHUNK),""): emit(chunk)
+            else:
+                emit(page_header(meta,opts,state,page["front"])); write_body(lines,emit)
+        if tmp and replace_output(tmp,out_fp): written=n[0]
+    finally:
+        if tmp and os.path.lexists(tmp): os.unlink(tmp)
+    return h.hexdigest() if same else None,n[0],written
+def convert_file(src_root,out_root,fp,opts,uuid_to_file,page=None):
+    # uuid_to_file is a Graph or a {uuid: absolute page path} dict
+    started=time.perf_counter()
+    page=page or read_page(fp,getattr(opts,"stream_above",None))
+    out_fp=fp; in_place=not out_root or out_root==src_root
+    if isinstance(uuid_to_file,Graph): out_fp=os.path.join(src_root if in_place else out_root,uuid_to_file.output_path(fp))
+    elif not in_place: out_fp=os.path.join(out_root,os.path.relpath(fp,src_root))
+    used=set(); resolve=_resolver(uuid_to_file,src_root,used)
+    if page["text"] is None:
+        # large pages stream to disk; they are left out of --diff
+        digest,size,written=convert_stream(page,out_fp,opts,resolve)
+        res={"out":out_fp,"changed":digest!=page["sha1"]}
+    else:
+        text=page["text"]
+        out_text=_convert(text,dict(page["meta"]),page["body"],fp,opts,resolve)
+        res={"out":out_fp,"changed":out_text!=text}
+        if getattr(opts,"incremental",False): digest=text_digest(out_text)
+        if getattr(opts,"diff",0) and res["changed"]:
+            res["diff"]="".join(difflib.unified_diff(text.splitlines(True),out_text.splitlines(True),fp,out_fp))
+        written=0; size=len(out_text.encode("utf-8"))
+        if not opts.dry_run:
+            if out_fp!=fp: os.makedirs(os.path.dirname(out_fp),exist_ok=True)
+            written=write_output(out_fp,out_text)
+    res.update(size=size,written=written)
+    if getattr(opts,"incremental",False): res["digest"]=digest
+    if getattr(opts,"referenced_assets",False): res["assets"]=sorted(used)
+    # an in-place journal rename: the converted page now lives at its new name
+    if not opts.dry_run and in_place and out_fp!=fp: os.unlink(fp)
+    if getattr(opts,"stats",False): res.update(seconds=time.perf_counter()-started,bytes=written)
+    return res
+# worker processes receive the read-only UUID index once, then convert files in batches
+_worker={}
+def _init_worker(src_root,out_root,opts,uuid_to_file): _worker.update(src=src_root,out=out_root,opts=opts,index=uuid_to_file)
+def _convert_batch(pages): return [convert_file(_worker["src"],_worker["out"],pg["fp"],_worker["opts"],_worker["index"],pg) for pg in pages]
+def convert_files(src_root,out_root,pages,opts,uuid_to_file):
+    jobs=getattr(opts,"jobs",1); io=getattr(opts,"io_concurrency",1)
+    if jobs==0: jobs=os.cpu_count() or 1
+    if jobs<=1 and io>1:
+        # conversion and write-back of up to io pages overlap on a thread pool; --jobs takes precedence
+        yield from io_iter(lambda pg: convert_file(src_root,out_root,pg["fp"],opts,uuid_to_file,pg),pages,io)
+        return
+    if jobs<=1 or len(pages)<2:
+        for pg in pages: yield convert_file(src_root,out_root,pg["fp"],opts,uuid_to_file,pg)
+        return
+    size=max(1,min(256,len(pages)//(jobs*4)))
+    batches=[pages[i:i+size] for i in range(0,len(pages),size)]
+    with ProcessPoolExecutor(max_workers=jobs,initializer=_init_worker,initargs=(src_root,out_root,opts,uuid_to_file)) as ex:
+        for results in ex.map(_convert_batch,batches): yield from results
+# --io-concurrency: on NFS/SMB shares every listdir, stat, open and write costs milliseconds, so these calls
+# are issued from an asyncio loop onto a thread pool with at most N in flight; results come back in input order
+async def aio_map(fn,items,limit,executor=None):
+    loop=asyncio.get_running_loop(); window=collections.deque()
+    for x in items:
+        window.append(loop.run_in_executor(executor,fn,x))
+        if len(window)>=limit: yield await window.popleft()
+    while window: yield await window.popleft()
+def io_iter(fn,items,concurrency):
+    # aio_map driven from plain code: each result is yielded as soon as it and the ones before it are done
+    loop=asyncio.new_event_loop(); ex=ThreadPoolExecutor(concurrency); it=aio_map(fn,items,concurrency,ex)
+    try:
+        while True:
+            try: r=loop.run_until_complete(it.__anext__())
+            except StopAsyncIteration: return
+            yield r
+    finally: loop.run_until_complete(it.aclose()); ex.shutdown(); loop.close()
+def io_map(fn,items,concurrency=1): return [fn(x) for x in items] if concurrency<=1 else list(io_iter(fn,items,concurrency))
+# ignore rules: Logseq's backups and recycle bin, hidden entries (.git, .obsidian, .DS_Store) and node_modules are
+# skipped unless --no-default-excludes; --include re-admits paths an exclude would drop
+BAK_GLOBS=("logseq/bak","logseq/.recycle"); DEFAULT_EXCLUDES=BAK_GLOBS+(".*","node_modules")
+def excluded(rel,patterns):
+    # patterns match the /-separated path relative to the graph root, or just the file/dir name
+    name=rel.rsplit("/",1)[-1]
+    return any(fnmatch.fnmatch(rel,p) or fnmatch.fnmatch(name,p) for p in patterns)
+def ignore_rules(exclude=(),include=(),defaults=True): return ((DEFAULT_EXCLUDES if defaults else ())+tuple(exclude),tuple(include))
+def ignored(rel,rules): return excluded(rel,rules[0]) and not excluded(rel,rules[1])
+def _list_dir(root,rel,skip,rules,prefetch=False):
+    # one scandir, split like os.walk (symlinked folders are not walked) and filtered; None if unreadable
+    dirs=[]; files=[]
+    try:
+        with os.scandir(root) as it:
+            for e in it:
+                try: is_dir=e.is_dir()
+                except OSError: is_dir=False
+                if ignored(rel+e.name,rules): continue
+                if not is_dir: files.append(e)
+                elif not e.is_symlink() and e.path!=skip: dirs.append(e)
+    except OSError: return None
+    # a thread listing a slow mount warms each entry's stat cache while it is there
+    if prefetch:
+        for e in files:
+            try: e.stat()
+            except OSError: pass
+    return dirs,files
+async def _aio_scan(root,prefix,skip,rules,concurrency):
+    # sibling folders are listed concurrently; the result keeps os.walk's top-down order
+    loop=asyncio.get_running_loop()
+    async def walk(root,rel):
+        listing=await loop.run_in_executor(ex,_list_dir,root,rel,skip,rules,True)
+        if listing is None: return []
+        subs=await asyncio.gather(*(walk(d.path,rel+d.name+"/") for d in listing[0]))
+        return [(rel,listing[1])]+[x for sub in subs for x in sub]
+    with ThreadPoolExecutor(concurrency) as ex: return await walk(root,prefix)
+def scan_tree(root,skip=None,rules=None,concurrency=1,prefix=""):
+    # the one walk of a graph per run: {"dirs": graph-relative dir prefixes ("" for the root, "pages/"),
+    # "files": [(graph-relative path, DirEntry)] in path order}; DirEntry.stat() is cached, so phases share one stat.
+    # Path order, not scandir's, decides which page wins a duplicated id, so sharded and full runs agree
+    # skip is an output directory nested inside root; prefix is root's own graph-relative prefix
+    rules=rules or ignore_rules()
+    if concurrency>1: listings=asyncio.run(_aio_scan(root,prefix,skip,rules,concurrency))
+    else:
+        listings=[]; stack=[(root,prefix)]
+        while stack:
+            d,rel=stack.pop(); listing=_list_dir(d,rel,skip,rules)
+            if listing is None: continue
+            listings.append((rel,listing[1])); stack.extend((e.path,rel+e.name+"/") for e in reversed(listing[0]))
+    return {"dirs":[rel for rel,_ in listings],"files":sorted(((rel+e.name,e) for rel,files in listings for e in files),key=lambda f: f[0])}
+def is_page(rel): return rel.lower().endswith(".md")
+def md_files(src_root,skip=None,exclude=(),concurrency=1):
+    for rel,e in scan_tree(src_root,skip,ignore_rules(exclude),concurrency)["files"]:
+        if is_page(rel): yield e.path
+FICLONE=0x40049409
+def copy_asset(src,dst,link=False):
+    # cheapest copy the filesystem allows: hardlink (opt-in), reflink, in-kernel copy_file_range, then copy2
+    if os.path.lexists(dst): os.unlink(dst)
+    if link:
+        try: os.link(src,dst); return
+        except OSError: pass
+    try:
+        with open(src,"rb") as fi, open(dst,"wb") as fo:
+            if fcntl:
+                try: fcntl.ioctl(fo.fileno(),FICLONE,fi.fileno()); shutil.copystat(src,dst); return
+                except OSError: pass
+            if hasattr(os,"copy_file_range"):
+                n=os.fstat(fi.fileno()).st_size
+                while n>0:
+                    k=os.copy_file_range(fi.fileno(),fo.fileno(),n)
+                    if k==0: break
+                    n-=k
+                if n==0: shutil.copystat(src,dst); return
+    except OSError: pass
+    shutil.copy2(src,dst)
+def refresh_asset(entry,out_fp,link=False):
+    # copy one asset unless it is unchanged (same size and mtime, which copy2/copystat preserve); -> bytes copied or None
+    a=entry.stat(); src_fp=entry.path
+    try:
+        b=os.stat(out_fp)
+        if a.st_size==b.st_size and int(a.st_mtime)==int(b.st_mtime): return None
+    except OSError: pass
+    copy_asset(src_fp,out_fp,link); return a.st_size
+def maybe_copy_tree(src,out,skip_md=False,exclude=(),link=False,concurrency=1,scan=None):
+    # with skip_md, Markdown pages are left to the conversion pipeline, which writes them itself
+    copied={"files":0,"bytes":0}
+    if not out: return copied
+    if os.path.abspath(src)==os.path.abspath(out): return copied
+    scan=scan or scan_tree(src,out,ignore_rules(exclude),concurrency)
+    for rel in scan["dirs"]: os.makedirs(os.path.join(out,rel),exist_ok=True)
+    jobs=[(e,os.path.join(out,rel),link) for rel,e in scan["files"] if not (skip_md and is_page(rel))]
+    for n in io_map(lambda job: refresh_asset(*job),jobs,concurrency):
+        if n is not None: copied["files"]+=1; copied["bytes"]+=n
+    return copied
+def is_asset(rel): return rel.startswith("assets/") and not is_page(rel)
+def file_digest(fp):
+    h=hashlib.sha1()
+    with open(fp,"rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK),b""): h.update(chunk)
+    return h.hexdigest()
+def share_asset(src,dst):
+    # a further copy of identical content: a reflink (its own copy-on-write file) where supported, else a hardlink
+    if os.path.lexists(dst): os.unlink(dst)
+    if fcntl:
+        try:
+            with open(src,"rb") as fi, open(dst,"wb") as fo: fcntl.ioctl(fo.fileno(),FICLONE,fi.fileno())
+            return
+        except OSError:
+            if os.path.lexists(dst): os.unlink(dst)
+    try: os.link(src,dst)
+    except OSError: copy_asset(src,dst)
+def copy_assets(out,files,concurrency=1,link=False):
+    # files: [(rel, DirEntry)] of referenced assets. Files of equal size are hashed; each set of identical files is
+    # copied once and the rest share that copy (see share_asset)
+    copied={"files":0,"bytes":0,"shared":0,"shared_bytes":0}; by_size={}
+    for rel,e in files: by_size.setdefault(e.stat().st_size,[]).append((rel,e))
+    twins=[f for same in by_size.values() if len(same)>1 for f in same]
+    digests=dict(zip([rel for rel,_ in twins],io_map(lambda f: file_digest(f[1].path),twins,concurrency)))
+    groups={}
+    for rel,e in files: groups.setdefault((e.stat().st_size,digests.get(rel,rel)),[]).append((rel,e))
+    for n in io_map(lambda g: refresh_asset(g[0][1],os.path.join(out,g[0][0]),link),list(groups.values()),concurrency):
+        if n is not None: copied["files"]+=1; copied["bytes"]+=n
+    for (size,_),same in groups.items():
+        first=os.path.join(out,same[0][0])
+        for rel,_ in same[1:]:
+            copied["shared"]+=1; copied["shared_bytes"]+=size; dst=os.path.join(out,rel)
+            if not (os.path.exists(dst) and os.path.samefile(first,dst)): share_asset(first,dst)
+    return copied
+def journal_name(fp):
+    d,fn=os.path.split(fp); base=fn[:-3]; new=hyphen_date_name(base)
+    return os.path.join(d,new+".md") if new and new!=base else fp
+# incremental runs: a manifest in the output root remembers each source page's stat, hash,
+# block ids, referenced ids and output hash, so unchanged pages are neither read nor rewritten
+MANIFEST_NAME=".logseq-to-obsidian.json"; MANIFEST_VERSION=3
+def text_digest(text): return hashlib.sha1(text.encode("utf-8")).hexdigest()
+def page_digest(page): return page.get("sha1") or text_digest(page["text"])
+def options_key(opts): return [MANIFEST_VERSION]+[bool(getattr(opts,k,False)) for k in ("frontmatter","status_tags","strip_properties","rename_journals","full_link_paths","referenced_assets","inline_embeds")]
+def load_manifest(work_root,opts):
+    try:
+        with open(os.path.join(work_root,MANIFEST_NAME),"r",encoding="utf-8") as f: m=json.load(f)
+        if m.get("options")==options_key(opts): return m
+    except (OSError,ValueError): pass
+    return {"options":options_key(opts),"files":{}}
+def save_manifest(work_root,manifest):
+    fp=os.path.join(work_root,MANIFEST_NAME)
+    with open(fp+".tmp","w",encoding="utf-8") as f: json.dump(manifest,f,separators=(",",":"))
+    os.replace(fp+".tmp",fp)
+def manifest_entry(fp,page):
+    st=os.stat(fp)
+    return {"mtime":st.st_mtime_ns,"size":st.st_size,"sha1":page_digest(page),"ids":[u for u,_ in page["ids"]],"names":list(page["names"]),"refs":page_refs(page)}
+def plan_incremental(src,work_root,files,manifest,opts,assets=()):
+    # files: [(rel, DirEntry)] from scan_tree, assets: the graph's other files with --referenced-assets;
+    # returns (pages to convert, uuid index over all pages, new manifest entries, outputs of deleted pages)
+    old=manifest["files"]; entries={}; loaded={}; dirty=set(); io=getattr(opts,"io_concurrency",1)
+    read=lambda fp: read_page(fp,opts.stream_above)
+    stale=[e.path for rel,e in files if not (rel in old and old[rel]["mtime"]==e.stat().st_mtime_ns and old[rel]["size"]==e.stat().st_size)]
+    fresh=dict(zip(stale,io_map(read,stale,io)))
+    for rel,ent in files:
+        e=old.get(rel); fp=ent.path
+        if fp not in fresh: entries[rel]=e; continue
+        pg=loaded[rel]=fresh[fp]; n=manifest_entry(fp,pg)
+        if e and e["sha1"]==n["sha1"]: entries[rel]=dict(e,mtime=n["mtime"],size=n["size"]); continue
+        entries[rel]=n; dirty.add(rel)
+    def index(ents):
+        g=Graph(src,opts)
+        for rel,e in ents.items(): g.add(rel,e["ids"],e["names"])
+        return g
+    # link text can change without its page changing: moved ids, renames, titles, new basename collisions
+    old_graph,graph=index(old),index(entries)
+    moved={u for u in set(old_graph.uids())|set(graph.uids()) if old_graph.link_title(u)!=graph.link_title(u)}
+    moved.update("[["+n for n in set(old_graph.titles)|set(graph.titles) if old_graph.page_link(n)!=graph.page_link(n))
+    # an added or removed asset changes whether links by its name resolve, and how its namesakes are linked
+    moved.update("!"+rel.rsplit("/",1)[-1].lower() for rel in set(manifest.get("assets",()))^set(assets))
+    if getattr(opts,"inline_embeds",False):
+        # inlined embeds copy text, so an edit reaches every page embedding it, directly or through other pages;
+        # as in sync_paths, a block or page that moved or was deleted starts the walk like an edited page does
+        gone=[e for rel,e in old.items() if rel not in entries]
+        keys=set(moved)|{u for e in gone for u in e["ids"]}|{"[["+n.lower() for e in gone for n in e["names"]}
+        stale=more=dirty|{rel for rel,e in entries.items() if keys.intersection(e["refs"])}
+        while more:
+            keys|={u for rel in more for u in entries[rel]["ids"]}|{"[["+n.lower() for rel in more for n in entries[rel]["names"]}
+            more={rel for rel,e in entries.items() if rel not in stale and keys.intersection(e["refs"])}
+            stale|=more
+        dirty|=stale
+    todo=[]; out=lambda rel,e: os.path.join(work_root,e.get("out",journal_name(rel) if opts.rename_journals else rel))
+    for rel,e in entries.items():
+        if rel in dirty or moved.intersection(e["refs"]) or not os.path.exists(out(rel,e)): todo.append(rel)
+    # a page gone from the graph takes its output with it, unless another page now writes there
+    gone={out(rel,e) for rel,e in old.items() if rel not in entries}-{out(rel,e) for rel,e in entries.items()}
+    return io_map(lambda rel: loaded.get(rel) or read(os.path.join(src,rel)),todo,io),graph,entries,sorted(gone)
+# --shard I/N splits a migration across machines sharing the graph: pages and assets are partitioned by a stable
+# hash of their graph-relative path. With --shard-index, phase one (--index-only) writes each shard's page ids
+# and names to DIR, and phase two merges every shard's file into the full index before converting
+SHARD_INDEX="index-{}-of-{}.json"; SHARD_INDEX_VERSION=1
+class ShardError(Exception): pass
+def parse_shard(s):
+    # "I/N" -> (I, N), shards numbered from 1
+    try: i,n=map(int,s.split("/"))
+    except ValueError: raise argparse.ArgumentTypeError(f"expected I/N, got {s!r}")
+    if not 1<=i<=n: raise argparse.ArgumentTypeError(f"shard {i} is not in 1..{n}")
+    return i,n
+def in_shard(rel,shard): return int(hashlib.sha1(rel.encode("utf-8")).hexdigest()[:8],16)%shard[1]==shard[0]-1
+def shard_index_path(d,shard): return os.path.join(d,SHARD_INDEX.format(*shard))
+def write_shard_index(d,shard,src,pages):
+    os.makedirs(d,exist_ok=True); fp=shard_index_path(d,shard)
+    part={os.path.relpath(pg["fp"],src).replace("\\","/"):{"ids":[u for u,_ in pg["ids"]],"names":list(pg["names"])} for pg in pages}
+    write_output(fp,json.dumps({"version":SHARD_INDEX_VERSION,"shard":list(shard),"pages":part},separators=(",",":"))); return fp
+def load_shard_indexes(d,n):
+    # every shard's pages in path order, so all shards build the same index (the first page declaring an id wins)
+    pages={}
+    for i in range(1,n+1):
+        fp=shard_index_path(d,(i,n))
+        try:
+            with open(fp,"r",encoding="utf-8") as f: part=json.load(f)
+        except (OSError,ValueError) as e: raise ShardError(f"cannot read {fp}: {e}")
+        if part.get("version")!=SHARD_INDEX_VERSION or part.get("shard")!=[i,n]: raise ShardError(f"{fp} is not a shard {i}/{n} index")
+        pages.update(part["pages"])
+    return dict(sorted(pages.items()))
+# checkpoints: a run that writes pages saves the index it converts against next to a journal holding a "pending"
+# line (with the source hash) for every page before conversion starts and a "done" line after each page is
+# written. --resume rebuilds the index from the checkpoint and converts only pages that are not done, so an
+# in-place page is converted exactly once; both files are removed when the run completes
+CHECKPOINT_NAME=".logseq-to-obsidian.checkpoint{}.json"; JOURNAL_NAME=".logseq-to-obsidian.journal{}"; CHECKPOINT_VERSION=1
+class ResumeError(Exception): pass
+def checkpoint_paths(work_root,shard=None):
+    suffix=f"-{shard[0]}-of-{shard[1]}" if shard else ""
+    return os.path.join(work_root,CHECKPOINT_NAME.format(suffix)),os.path.join(work_root,JOURNAL_NAME.format(suffix))
+def save_checkpoint(fp,opts,graph):
+    pages={rel:{"ids":graph.page_uids(rel),"names":list(graph.page_names[rel])} for rel in graph.page_ids}
+    write_output(fp,json.dumps({"version":CHECKPOINT_VERSION,"options":options_key(opts),"pages":pages},separators=(",",":")))
+def load_checkpoint(fp,jp,opts,src):
+    # -> (graph, {rel: "done" | source sha1 of a pending page}, assets the done pages use), or None when there is no interrupted run
+    try:
+        with open(fp,"r",encoding="utf-8") as f: state=json.load(f)
+    except FileNotFoundError: return None
+    except (OSError,ValueError) as e: raise ResumeError(f"cannot read checkpoint {fp}: {e}")
+    if state.get("version")!=CHECKPOINT_VERSION or state.get("options")!=options_key(opts):
+        raise ResumeError(f"{fp} was written by a run with other conversion options; rerun with those options or remove it to start over")
+    graph=Graph(src,opts)
+    for rel,e in state["pages"].items(): graph.add(rel,e["ids"],e["names"])
+    journal={}; assets=set()
+    try:
+        with open(jp,"r",encoding="utf-8") as f:
+            for line in f:
+                # a crash can cut the last line short
+                try: e=json.loads(line)
+                except ValueError: continue
+                if "done" in e: journal[e["done"]]="done"; assets.update(e.get("assets",()))
+                else: journal.setdefault(e["pending"],e["sha1"])
+    except FileNotFoundError: pass
+    return graph,journal,assets
+# --watch: keep the vault in sync by reconverting only touched pages and the pages that reference
+# blocks whose target moved; inotify where available (Linux, via libc), stat polling elsewhere
+IN_MODIFY,IN_MOVED_FROM,IN_MOVED_TO,IN_CREATE,IN_DELETE,IN_CLOSE_WRITE,IN_ISDIR=0x2,0x40,0x80,0x100,0x200,0x8,0x40000000
+class _Inotify:
+    MASK=IN_MODIFY|IN_CLOSE_WRITE|IN_MOVED_FROM|IN_MOVED_TO|IN_CREATE|IN_DELETE
+    def __init__(self,dirs):
+        import ctypes,ctypes.util
+        self.libc=ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",use_errno=True)
+        self.fd=self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd<0: raise OSError(ctypes.get_errno(),"inotify_init1 failed")
+        self.dirs={}
+        for d in dirs: self.add(d)
+    def add(self,d):
+        wd=self.libc.inotify_add_watch(self.fd,os.fsencode(d),self.MASK)
+        if wd>=0: self.dirs[wd]=d
+    def read(self,timeout):
+        # -> (changed paths, new directories); empty when the timeout expires
+        import select,struct
+        if not select.select([self.fd],[],[],timeout)[0]: return set(),[]
+        data=os.read(self.fd,1<<16); paths=set(); new_dirs=[]; i=0
+        while i+16<=len(data):
+            wd,mask,_,n=struct.unpack_from("iIII",data,i); name=data[i+16:i+16+n].rstrip(b"\0"); i+=16+n
+            if wd not in self.dirs or not name: continue
+            fp=os.path.join(self.dirs[wd],os.fsdecode(name))
+            if mask&IN_ISDIR:
+                if mask&(IN_CREATE|IN_MOVED_TO): new_dirs.append(fp)
+            else: paths.add(fp)
+        return paths,new_dirs
+def snapshot(src,skip=None,rules=None):
+    snap={}
+    for _,e in scan_tree(src,skip,rules)["files"]:
+        try: st=e.stat(); snap[e.path]=(st.st_mtime_ns,st.st_size)
+        except OSError: pass
+    return snap
+def excluded_path(rel,rules):
+    # like ignored(), but also true when any parent folder is ignored
+    parts=rel.split("/")
+    return any(ignored("/".join(parts[:i]),rules) for i in range(1,len(parts)+1))
+def reference_map(by_page):
+    # page -> ids and "[[name" links it references (see page_refs), plus the inverse -> referring pages
+    referrers={}
+    for rel,uids in by_page.items():
+        for u in uids: referrers.setdefault(u,set()).add(rel)
+    return {"pages":{rel:set(uids) for rel,uids in by_page.items()},"ids":referrers}
+def sync_paths(src,out,paths,args,graph,refs,rules):
+    # bring the vault up to date for a set of changed source paths; returns (pages, referrers) converted
+    changed={}; moved=set(); removed=0; touched_all=set()
+    for fp in sorted(paths):
+        rel=os.path.relpath(fp,src).replace("\\","/")
+        if rel.startswith("../") or (fp+os.sep).startswith(out+os.sep) or excluded_path(rel,rules): continue
+        out_fp=os.path.join(out,rel)
+        if not rel.lower().endswith(".md"):
+            if os.path.isfile(fp): os.makedirs(os.path.dirname(out_fp),exist_ok=True); copy_asset(fp,out_fp,args.link_assets); graph.add_asset(rel)
+            else:
+                graph.remove_asset(rel)
+                if os.path.lexists(out_fp): os.unlink(out_fp)
+            continue
+        try: pg=read_page(fp,args.stream_above)
+        except OSError: pg=None
+        new_ids=[u for u,_ in pg["ids"]] if pg else []
+        touched=set(graph.page_uids(rel))|set(new_ids)|{"[["+n.lower() for n in (pg["names"] if pg else ())}
+        for other in graph.namesakes(rel)|{rel}: touched.update(graph.page_uids(other),("[["+n for n in graph.page_names.get(other,())))
+        before={u:graph.target(u) for u in touched}; touched_all|=touched
+        for u in refs["pages"].pop(rel,()): refs["ids"].get(u,set()).discard(rel)
+        if pg:
+            graph.add_page(pg); changed[rel]=pg; refs["pages"][rel]=set(page_refs(pg))
+            for u in refs["pages"][rel]: refs["ids"].setdefault(u,set()).add(rel)
+        else:
+            graph.remove(rel); removed+=1
+            for dead in {out_fp,os.path.join(out,graph.output_path(rel))}:
+                if os.path.lexists(dead): os.unlink(dead)
+        moved.update(u for u in touched if graph.target(u)!=before[u])
+    referrers={r for u in moved for r in refs["ids"].get(u,())}-set(changed)
+    if getattr(args,"inline_embeds",False):
+        # as in plan_incremental: pages embedding a changed page, directly or not, are reconverted too
+        frontier={r for u in touched_all for r in refs["ids"].get(u,())}-set(changed)
+        while frontier:
+            referrers|=frontier; keys=set()
+            for rel in frontier: keys.update(graph.page_uids(rel),("[["+n for n in graph.page_names.get(rel,())))
+            frontier={r for u in keys for r in refs["ids"].get(u,())}-referrers-set(changed)
+    for rel in referrers:
+        try: changed[rel]=read_page(os.path.join(src,rel),args.stream_above)
+        except OSError: pass
+    outs=[convert_file(src,out,pg["fp"],args,graph,pg) for pg in changed.values()]
+    if args.fsync: fsync_outputs([res["out"] for res in outs if res["written"]])
+    return len(changed)-len(referrers)+removed,len(referrers)
+def watch(src,out,args,graph,refs,rules):
+    try: ino=_Inotify([os.path.join(src,rel) for rel in scan_tree(src,out,rules)["dirs"]]) if sys.platform.startswith("linux") else None
+    except OSError: ino=None
+    snap=None if ino else snapshot(src,out,rules)
+    print(f"Watching {src} ({'inotify' if ino else 'polling every %gs' % args.watch_interval}); Ctrl-C to stop.",flush=True)
+    try:
+        while True:
+            if ino:
+                paths,new_dirs=ino.read(None)
+                # let a burst of editor writes settle before converting
+                while True:
+                    more,more_dirs=ino.read(0.05)
+                    if not more and not more_dirs: break
+                    paths|=more; new_dirs+=more_dirs
+                for d in new_dirs:
+                    rel=os.path.relpath(d,src).replace("\\","/")+"/"
+                    if rel.startswith("../") or excluded_path(rel[:-1],rules): continue
+                    found=scan_tree(d,out,rules,prefix=rel)
+                    for r in found["dirs"]: ino.add(os.path.join(src,r))
+                    paths.update(e.path for _,e in found["files"])
+            else:
+                time.sleep(args.watch_interval)
+                cur=snapshot(src,out,rules); paths={fp for fp in set(cur)|set(snap) if cur.get(fp)!=snap.get(fp)}; snap=cur
+            if not paths: continue
+            started=time.perf_counter()
+            n,r=sync_paths(src,out,paths,args,graph,refs,rules)
+            if n or r: print(f"Synced {n} pages and {r} referring pages in {(time.perf_counter()-started)*1000:.0f} ms",flush=True)
+    except KeyboardInterrupt: pass
+# --stats/--stats-json: wall time, files and bytes per phase, plus the slowest pages
+def new_stats(): return {"phases":{},"slowest":[]}
+@contextlib.contextmanager
+def phase(stats,name):
+    ph=stats["phases"].setdefault(name,{"seconds":0.0,"files":0,"bytes_read":0,"bytes_written":0})
+    started=time.perf_counter()
+    try: yield ph
+    finally: ph["seconds"]+=time.perf_counter()-started
+def finish_stats(stats,top):
+    for ph in stats["phases"].values():
+        ph["files_per_sec"]=round(ph["files"]/ph["seconds"],1) if ph["seconds"] and ph["files"] else None; ph["seconds"]=round(ph["seconds"],6)
+    stats["total_seconds"]=round(sum(ph["seconds"] for ph in stats["phases"].values()),6)
+    stats["slowest"]=[{"file":fp,"seconds":round(sec,6)} for sec,fp in sorted(stats["slowest"],reverse=True)[:top]]
+    stats["caches"]=cache_stats()
+    return stats
+def print_stats(stats):
+    print(f"{'phase':<10}{'seconds':>10}{'files':>9}{'MB read':>10}{'MB written':>12}{'files/s':>10}")
+    for name,ph in stats["phases"].items():
+        fps="" if ph["files_per_sec"] is None else f"{ph['files_per_sec']:.0f}"
+        print(f"{name:<10}{ph['seconds']:>10.3f}{ph['files']:>9}{ph['bytes_read']/1e6:>10.1f}{ph['bytes_written']/1e6:>12.1f}{fps:>10}")
+    print(f"{'total':<10}{stats['total_seconds']:>10.3f}")
+    if stats["slowest"]:
+        print("Slowest pages:")
+        for s in stats["slowest"]: print(f"  {s['seconds']:.4f}s  {s['file']}")
+    # with --jobs the helper caches live in the workers, so only main-process use shows up here
+    for name,c in stats["caches"].items():
+        if c["hits"] or c["misses"]: print(f"{name} cache: {c['hits']} hits, {c['misses']} misses, {c['currsize']}/{c['maxsize']} entries")
+    ix=stats.get("index")
+    if ix: print(f"uuid index: {ix['uuids']} ids in {ix['pages']} pages, {ix['memory_bytes']/1e6:.1f} MB in memory"+(f", {ix['disk_bytes']/1e6:.1f} MB on disk ({ix['backend']})" if ix["disk_bytes"] else ""))
+def report_stats(stats,args,graph=None):
+    if not args.stats: return
+    if graph is not None: stats["index"]=graph.footprint()
+    finish_stats(stats,args.stats_top); print_stats(stats)
+    if args.stats_json:
+        with open(args.stats_json,"w",encoding="utf-8") as f: json.dump(stats,f,indent=2)
+def _record(args,src,work_root,pg,res,n,diffs,renames,entries):
+    plain=os.path.join(work_root,os.path.relpath(pg["fp"],src))
+    if res["out"]!=plain: renames.append((plain,res["out"]))
+    if "diff" in res:
+        heapq.heappush(diffs,(len(res["diff"]),n,res["diff"]))
+        if len(diffs)>args.diff: heapq.heappop(diffs)
+    if entries is not None:
+        rel=os.path.relpath(pg["fp"],src).replace("\\","/")
+        entries[rel]=dict(manifest_entry(pg["fp"],pg),out=os.path.relpath(res["out"],work_root).replace("\\","/"),out_sha1=res["digest"])
+        if "assets" in res: entries[rel]["assets"]=res["assets"]
 def main():
     p=argparse.ArgumentParser()
     p.add_argument("--src",required=True)
     p.add_argument("--out")
     p.add_argument("--dry-run",action="store_true")
     p.add_argument("--rename-journals",action="store_true")
+    p.add_argument("--full-link-paths",action="store_true",help="always link blocks by vault path instead of the shortest unique name")
     p.add_argument("--frontmatter",action="store_true")
     p.add_argument("--status-tags",action="store_true")
     p.add_argument("--strip-properties",action="store_true")
+    p.add_argument("--jobs",type=int,default=1,help="convert files in N worker processes (0 = one per CPU)")
+    p.add_argument("--exclude",action="append",default=[],metavar="GLOB",help="skip files and folders matching GLOB (repeatable)")
+    p.add_argument("--include",action="append",default=[],metavar="GLOB",help="scan files and folders matching GLOB even if an exclude rule matches (repeatable)")
+    p.add_argument("--no-default-excludes",action="store_true",help="also scan logseq/bak, logseq/.recycle, hidden entries and node_modules")
+    p.add_argument("--skip-bak",action="store_true",help="skip logseq/bak and logseq/.recycle even with --no-default-excludes")
+    p.add_argument("--link-assets",action="store_true",help="hardlink non-Markdown files into --out instead of copying them")
+    p.add_argument("--referenced-assets",action="store_true",help="rewrite ../assets links to ![[embeds]] and copy only the assets pages use, storing identical files once")
+    p.add_argument("--inline-embeds",action="store_true",help="copy embedded blocks and pages into the embedding page instead of linking them with ![[...]]")
+    p.add_argument("--list-orphans",action="store_true",help="with --referenced-assets, list the assets no page uses")
+    p.add_argument("--diff",type=int,default=0,metavar="N",help="print unified diffs for the N most changed pages")
+    p.add_argument("--incremental",action="store_true",help="only reconvert pages changed since the last --incremental run")
+    p.add_argument("--stats",action="store_true",help="report time, files and bytes per phase and the slowest pages")
+    p.add_argument("--stats-top",type=int,default=10,metavar="N",help="number of slowest pages --stats lists")
+    p.add_argument("--stats-json",metavar="PATH",help="write the --stats report as JSON to PATH")
+    p.add_argument("--watch",action="store_true",help="after migrating, keep --out in sync with changes in --src until interrupted")
+    p.add_argument("--watch-interval",type=float,default=1.0,metavar="SECONDS",help="polling interval for --watch where inotify is unavailable")
+    p.add_argument("--io-concurrency",type=int,default=1,metavar="N",help="keep up to N directory listings, reads, copies and writes in flight (for network shares)")
+    p.add_argument("--index-spill",type=int,default=0,metavar="N",help="move the UUID index to an on-disk SQLite table once it holds more than N ids (0 = never)")
+    p.add_argument("--stream-above",type=float,default=STREAM_ABOVE/(1<<20),metavar="MB",help="convert pages larger than MB line by line instead of in memory")
+    p.add_argument("--fsync",action="store_true",help="flush written pages and their folders to disk at the end of the run")
+    p.add_argument("--shard",type=parse_shard,metavar="I/N",help="convert only shard I of N (a stable split of the graph's files, for running on several machines)")
+    p.add_argument("--shard-index",metavar="DIR",help="with --shard: merge the shard indexes in DIR instead of indexing the whole graph")
+    p.add_argument("--index-only",action="store_true",help="with --shard-index: write this shard's index to DIR and stop (phase one)")
+    p.add_argument("--resume",action="store_true",help="finish an interrupted run from its checkpoint, converting only the pages it had not done")
+    p.add_argument("--profile",metavar="PATH",help="run under cProfile and write the profile to PATH (main process only)")
     args=p.parse_args()
     src=os.path.abspath(args.src); out=os.path.abspath(args.out) if args.out else None
-    maybe_copy_tree(src,out)
+    if not os.path.isdir(src): p.error(f"--src {args.src} is not a directory")
+    if args.incremental and (not out or out==src): p.error("--incremental needs a separate --out vault")
+    if args.watch and (not out or out==src or args.dry_run): p.error("--watch needs a separate --out vault and no --dry-run")
+    # embedded pages are read while converting, and in place they may already have been rewritten
+    if args.inline_embeds and (not out or out==src): p.error("--inline-embeds needs a separate --out vault")
+    if (args.shard_index or args.index_only) and not args.shard: p.error("--shard-index and --index-only need --shard")
+    if args.index_only and not args.shard_index: p.error("--index-only needs --shard-index")
+    # in place, each shard would index pages other shards have already converted
+    if args.shard and not args.shard_index and (not out or out==src): p.error("--shard needs --shard-index or a separate --out vault when converting in place")
+    if args.shard and (args.incremental or args.watch or args.referenced_assets): p.error("--shard cannot be combined with --incremental, --watch or --referenced-assets")
+    if args.resume and (args.incremental or args.watch): p.error("--resume cannot be combined with --incremental or --watch")
+    if args.shard_index and not args.index_only:
+        missing=[str(i) for i in range(1,args.shard[1]+1) if not os.path.exists(shard_index_path(args.shard_index,(i,args.shard[1])))]
+        if missing: p.error(f"--shard-index {args.shard_index} has no index from shard {', '.join(missing)} of {args.shard[1]}; run them with --index-only first")
+    args.stats=args.stats or bool(args.stats_json); args.stream_above=int(args.stream_above*(1<<20))
+    try:
+        if args.profile:
+            import cProfile
+            prof=cProfile.Profile()
+            try: state=prof.runcall(migrate,src,out,args)
+            finally: prof.dump_stats(args.profile)
+        else: state=migrate(src,out,args)
+    except (ShardError,ResumeError) as e: p.error(str(e))
+    if args.watch: watch(src,out,args,state["graph"],state["refs"],state["rules"])
+def migrate(src,out,args):
+    stats=new_stats()
+    rules=ignore_rules(args.exclude+list(BAK_GLOBS if args.skip_bak else ()),args.include,not args.no_default_excludes)
+    # one scan feeds every phase: assets to copy, pages to read, and (incremental) their cached stat
+    with phase(stats,"scan") as ph:
+        scan=scan_tree(src,out,rules,args.io_concurrency); ph["files"]=len(scan["files"])
+    mine=(lambda rel: in_shard(rel,args.shard)) if args.shard else (lambda rel: True)
+    if not args.dry_run and not args.index_only:
+        with phase(stats,"copy") as ph:
+            # with --referenced-assets, assets/ waits for the pages to say which files they use
+            scanned=dict(scan,files=[f for f in scan["files"] if mine(f[0]) and not (args.referenced_assets and is_asset(f[0]))])
+            copied=maybe_copy_tree(src,out,skip_md=True,link=args.link_assets,concurrency=args.io_concurrency,scan=scanned)
+            ph["files"]=copied["files"]; ph["bytes_read"]=ph["bytes_written"]=copied["bytes"]
     work_root=out or src
-    uuid_to_file=build_uuid_index(work_root)
-    anchor_targets={}
-    changed=0; total=0
-    for root,_,files in os.walk(work_root):
-        for fn in files:
-            if not fn.lower().endswith(".md"): continue
-            fp=os.path.join(root,fn)
-            res=convert_file(work_root,work_root,fp,args,uuid_to_file,anchor_targets)
+    # every run that writes pages keeps a checkpoint; --incremental has its manifest instead
+    cp,jp=checkpoint_paths(work_root,args.shard); checkpoint=not (args.dry_run or args.incremental or args.index_only)
+    resume=load_checkpoint(cp,jp,args,src) if getattr(args,"resume",False) else None
+    if checkpoint and not resume and work_root==src and os.path.exists(cp):
+        raise ResumeError(f"{cp} is left from an interrupted in-place run; pass --resume to finish it, converting the rest of the pages once")
+    # phase 1 reads every page once; phase 2 resolves ((uuid)) refs against the index in memory
+    with phase(stats,"read") as ph:
+        files=[(rel,e) for rel,e in scan["files"] if is_page(rel)]
+        if args.incremental:
+            manifest=load_manifest(work_root,args)
+            assets=[rel for rel,_ in scan["files"] if not is_page(rel)] if args.referenced_assets else []
+            pages,graph,entries,gone=plan_incremental(src,work_root,files,manifest,args,assets)
+        else:
+            # a shard reads only its own pages when the other shards' ids come from --shard-index; phase two converts
+            # only the pages phase one indexed, so a journal another shard renamed in place is not converted again
+            if args.shard_index or resume: files=[f for f in files if mine(f[0])]
+            if args.shard_index and not args.index_only:
+                merged=load_shard_indexes(args.shard_index,args.shard[1]); files=[f for f in files if f[0] in merged]
+            if resume:
+                # in place, journals the interrupted run renamed are its outputs now, not pages to convert
+                outs={resume[0].paths[rel] for rel in resume[1]}-resume[0].paths.keys() if work_root==src else set()
+                files=[f for f in files if resume[1].get(f[0])!="done" and f[0] not in outs]
+            pages=io_map(lambda f: read_page(f[1].path,args.stream_above),files,args.io_concurrency)
+            if resume:
+                # in place, a pending page no longer matching its source hash was written before the run died
+                if work_root==src: pages=[pg for (rel,_),pg in zip(files,pages) if resume[1].get(rel) in (None,page_digest(pg))]
+                resumed=len(resume[1])-sum(1 for pg in pages if resume[0].rel(pg["fp"]) in resume[1])
+        ph["files"]=len(pages); ph["bytes_read"]=sum(pg["size"] for pg in pages)
+    if args.index_only:
+        with phase(stats,"index") as ph: fp=write_shard_index(args.shard_index,args.shard,src,pages); ph["files"]=len(pages)
+        print(f"Shard {args.shard[0]}/{args.shard[1]}: indexed {len(pages)} pages into {fp}.")
+        report_stats(stats,args); return {"graph":None,"refs":None,"rules":rules}
+    if not args.incremental:
+        with phase(stats,"index") as ph:
+            # a resumed run converts against the index it started with: pages done in place have lost their id:: lines
+            if resume: graph=resume[0]
+            else:
+                graph=Graph(src,args)
+                if args.shard_index:
+                    for rel,e in merged.items(): graph.add(rel,e["ids"],e["names"])
+                else:
+                    for pg in pages: graph.add_page(pg)
+            ph["files"]=len(graph.page_ids)
+        if args.shard: pages=[pg for pg in pages if mine(graph.rel(pg["fp"]))]
+    if args.referenced_assets:
+        for rel,_ in scan["files"]:
+            if not is_page(rel): graph.add_asset(rel)
+    changed=0; total=0; diffs=[]; renames=[]; used=set(resume[2] if resume else ()); written=[]; kept=[0,0]; journal=None
+    if checkpoint:
+        # the journal is truncated before a fresh checkpoint replaces the old one
+        journal=open(jp,"a" if resume else "w",encoding="utf-8")
+        if not resume: save_checkpoint(cp,args,graph)
+        journal.writelines(json.dumps({"pending":graph.rel(pg["fp"]),"sha1":page_digest(pg)})+"\n" for pg in pages); journal.flush()
+        if args.fsync: os.fsync(journal.fileno())
+    with phase(stats,"convert") as ph:
+        for pg,res in zip(pages,convert_files(src,work_root,pages,args,graph)):
             total+=1; changed+=1 if res["changed"] else 0
-    renames=rename_journals(work_root,args)
-    print(f"Processed {total} files; changed {changed}. Renamed {len(renames)} journals.")
+            if res["written"]: written.append((res["out"],res["written"]))
+            elif not args.dry_run: kept[0]+=1; kept[1]+=res["size"]
+            if args.stats:
+                ph["files"]+=1; ph["bytes_read"]+=pg["size"]; ph["bytes_written"]+=res["bytes"]
+                heapq.heappush(stats["slowest"],(res["seconds"],pg["fp"]))
+                if len(stats["slowest"])>args.stats_top: heapq.heappop(stats["slowest"])
+            _record(args,src,work_root,pg,res,total,diffs,renames,entries if args.incremental else None); used.update(res.get("assets",()))
+            if journal: journal.write(json.dumps({"done":graph.rel(pg["fp"]),**({"assets":res["assets"]} if "assets" in res else {})})+"\n"); journal.flush()
+        if args.fsync: fsync_outputs([fp for fp,_ in written])
+    if args.referenced_assets:
+        if args.incremental:
+            for e in entries.values(): used.update(e.get("assets",()))
+        orphans=[(rel,e) for rel,e in scan["files"] if is_asset(rel) and rel not in used]
+        copied={"shared":0}
+        if not args.dry_run and out and out!=src:
+            with phase(stats,"assets") as ph:
+                copied=copy_assets(out,[(rel,e) for rel,e in scan["files"] if is_asset(rel) and rel in used],args.io_concurrency,args.link_assets)
+                ph["files"]=copied["files"]; ph["bytes_read"]=ph["bytes_written"]=copied["bytes"]
+    if journal: journal.close(); os.unlink(cp); os.unlink(jp)
+    summary=f"Processed {total} files; changed {changed}. Renamed {len(renames)} journals."
+    if args.incremental:
+        # the other files copied into a separate vault are tracked too: ones deleted from the graph (or, with
+        # --referenced-assets, no longer referenced) are removed like the outputs of deleted pages
+        copies=[rel for rel,_ in scan["files"] if not is_page(rel) and (rel in used if args.referenced_assets and is_asset(rel) else mine(rel))] if out and os.path.abspath(out)!=os.path.abspath(src) else []
+        dropped=sorted(set(manifest.get("copied",()))-set(copies))
+        summary+=f" Skipped {len(files)-total} unchanged files. Removed {len(gone)} pages deleted from the graph and {len(dropped)} assets no longer copied."
+        if not args.dry_run:
+            for fp in gone+[os.path.join(out,rel) for rel in dropped]:
+                if os.path.lexists(fp): os.unlink(fp)
+            save_manifest(work_root,{"options":manifest["options"],"files":entries,"assets":assets,"copied":copies})
+    if resume: summary+=f" Resumed an interrupted run; {resumed} pages were already converted."
+    if args.shard: summary=f"Shard {args.shard[0]}/{args.shard[1]}: "+summary
+    if not args.dry_run: summary+=f" Wrote {len(written)} pages ({sum(n for _,n in written)/1e6:.1f} MB); {kept[0]} already up to date ({kept[1]/1e6:.1f} MB) left untouched."
+    print(summary)
+    if args.referenced_assets:
+        print(f"Referenced {len(used)} assets ({copied['shared']} stored as shared copies); {len(orphans)} orphaned assets ({sum(e.stat().st_size for _,e in orphans)/1e6:.1f} MB) left out.")
+        if args.list_orphans:
+            for rel,_ in orphans: print(f"ORPHAN: {rel}")
     if args.dry_run:
         for s,d in renames: print(f"RENAME: {s} -> {d}")
+    for _,_,d in sorted(diffs,reverse=True): sys.stdout.write(d if d.endswith("\n") else d+"\n")
+    report_stats(stats,args,graph)
+    refs=None
+    if getattr(args,"watch",False):
+        refs=reference_map({rel:e["refs"] for rel,e in entries.items()} if args.incremental else {graph.rel(pg["fp"]):page_refs(pg) for pg in pages})
+    return {"graph":graph,"refs":refs,"rules":rules}
 if __name__=="__main__": main()
@@ -128,6 +128,32 @@ updated:: 2023-09-05
         self.assertIn('- migration', output_content)
         self.assertIn('date:', output_content)
     
+    def test_untouched_frontmatter_is_kept(self):
+        """Test that frontmatter is written back byte for byte unless conversion changes a key"""
+        self.create_test_file('pages/Kept.md', "---\ntitle: Kept\n# reviewed\naliases: [K]\n---\n- Plain block\n")
+        self.create_test_file('pages/Tagged.md', "---\ntitle: Tagged\naliases: [T]\n---\ntags:: extra\n- Block\n")
+        output_dir = os.path.join(self.test_dir, 'output')
+
+        result = self.run_script(['--src', self.test_dir, '--out', output_dir, '--frontmatter'])
+
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('changed 1', result.stdout)
+        with open(os.path.join(output_dir, 'pages', 'Kept.md'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "---\ntitle: Kept\n# reviewed\naliases: [K]\n---\n- Plain block\n")
+        with open(os.path.join(output_dir, 'pages', 'Tagged.md'), 'r', encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith("---\naliases:\n- T\ntags:\n- extra\ntitle: Tagged\n---\n"))
+
+    def test_frontmatter_keeps_emoji(self):
+        """Test that rewritten frontmatter keeps characters outside the BMP instead of escaping them"""
+        self.create_test_file('pages/Launch.md', "---\ntitle: Launch 🚀 plan\n---\ntags:: rocket\n- Block\n")
+        output_dir = os.path.join(self.test_dir, 'output')
+
+        result = self.run_script(['--src', self.test_dir, '--out', output_dir, '--frontmatter'])
+
+        self.assertEqual(result.returncode, 0)
+        with open(os.path.join(output_dir, 'pages', 'Launch.md'), 'r', encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith("---\ntags:\n- rocket\ntitle: Launch 🚀 plan\n---\n"))
+
     def test_journal_file_renaming(self):
         """Test journal file renaming from underscore to hyphen format"""
         content = """# Journal Entry
@@ -159,6 +185,306 @@ Some journal content.
         
         self.assertIn('date: \'2023-09-04\'', content)
     
+    def test_block_reference_to_renamed_journal(self):
+        """Test that block references into renamed journals use the new journal name"""
+        self.create_test_file('journals/2023_09_04.md', "- Standup notes\n  id:: 64f5a1b2-0000-4000-8000-000000000005\n")
+        self.create_test_file('pages/Notes.md', "- See ((64f5a1b2-0000-4000-8000-000000000005))\n")
+        
+        result = self.run_script([
+            '--src', self.test_dir,
+            '--out', os.path.join(self.test_dir, 'output'),
+            '--rename-journals'
+        ])
+        
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Renamed 1 journals', result.stdout)
+        with open(os.path.join(self.test_dir, 'output', 'pages', 'Notes.md'), 'r', encoding='utf-8') as f:
+            self.assertIn('[[2023-09-04#^64f5a1b2-0000-4000-8000-000000000005]]', f.read())
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'output', 'journals', '2023-09-04.md')))
+    
+    def test_shortest_unique_block_links(self):
+        """Test that block links use the bare page name unless another page shares it"""
+        self.create_test_file('pages/Meeting.md', "- Agenda\n  id:: 64f5a1b2-0000-4000-8000-000000000006\n")
+        self.create_test_file('pages/Solo.md', "- Only one\n  id:: 64f5a1b2-0000-4000-8000-000000000007\n")
+        self.create_test_file('pages/Notes.md', "- ((64f5a1b2-0000-4000-8000-000000000006)) ((64f5a1b2-0000-4000-8000-000000000007))\n")
+        output_dir = os.path.join(self.test_dir, 'output')
+        notes = os.path.join(output_dir, 'pages', 'Notes.md')
+
+        result = self.run_script(['--src', self.test_dir, '--out', output_dir, '--incremental'])
+        self.assertEqual(result.returncode, 0)
+        with open(notes, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "- [[Meeting#^64f5a1b2-0000-4000-8000-000000000006]] [[Solo#^64f5a1b2-0000-4000-8000-000000000007]]\n")
+
+        # a second "meeting" page makes the name ambiguous, so an incremental run relinks Notes
+        self.create_test_file('pages/work/meeting.md', "- Other\n")
+        result = self.run_script(['--src', self.test_dir, '--out', output_dir, '--incremental'])
+        self.assertEqual(result.returncode, 0)
+        with open(notes, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "- [[pages/Meeting#^64f5a1b2-0000-4000-8000-000000000006]] [[Solo#^64f5a1b2-0000-4000-8000-000000000007]]\n")
+
+        result = self.run_script(['--src', self.test_dir, '--out', output_dir, '--full-link-paths'])
+        self.assertEqual(result.returncode, 0)
+        with open(notes, 'r', encoding='utf-8') as f:
+            self.assertIn('[[pages/Solo#^64f5a1b2-0000-4000-8000-000000000007]]', f.read())
+
+    def test_namespace_title_and_alias_links(self):
+        """Test that page links resolve through namespaces, %2F encoding, title:: and alias::"""
+        self.create_test_file('pages/Project___Sub Page.md', "- Namespaced\n  id:: 64f5a1b2-0000-4000-8000-000000000008\n")
+        self.create_test_file('pages/Area%2FHome.md', "- Encoded\n")
+        self.create_test_file('pages/renamed.md', "title:: Real Name\nalias:: RN, [[Other Name]]\n\n- Titled\n")
+        self.create_test_file('pages/Plain.md', "- Plain\n  alias:: [[Plain Too]]\n  - [[Plain]]\n")
+        self.create_test_file('pages/Notes.md',
+            "- [[Project/Sub Page]] [[area/home]] [[Real Name]] [[RN]] [[Other Name]] [[Plain]] [[Missing]]\n"
+            "- ((64f5a1b2-0000-4000-8000-000000000008))\n")
+        output_dir = os.path.join(self.test_dir, 'output')
+        notes = os.path.join(output_dir, 'pages', 'Notes.md')
+
+        result = self.run_script(['--src', self.test_dir, '--out', output_dir, '--incremental'])
+        self.assertEqual(result.returncode, 0)
+        with open(notes, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(),
+                "- [[Project___Sub Page|Project/Sub Page]] [[Area%2FHome|area/home]] [[renamed|Real Name]] "
+                "[[renamed|RN]] [[renamed|Other Name]] [[Plain]] [[Missing]]\n"
+                "- [[Project___Sub Page#^64f5a1b2-0000-4000-8000-000000000008]]\n")
+        # a page's own title::/alias:: lines name it; they are not rewritten into links to itself
+        with open(os.path.join(output_dir, 'pages', 'renamed.md'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "title:: Real Name\nalias:: RN, [[Other Name]]\n\n- Titled\n")
+        with open(os.path.join(output_dir, 'pages', 'Plain.md'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "- Plain\n  alias:: [[Plain Too]]\n  - [[Plain]]\n")
+
+        # retitling a page relinks the pages that link to it on an incremental run
+        self.create_test_file('pages/renamed.md', "title:: Another Name\n\n- Titled\n")
+        result = self.run_script(['--src', self.test_dir, '--out', output_dir, '--incremental'])
+        self.assertEqual(result.returncode, 0)
+        with open(notes, 'r', encoding='utf-8') as f:
+            content = f.read()
+        self.assertIn('[[Real Name]] [[RN]] [[Other Name]]', content)
+
+    def test_streamed_pages_match_in_memory_conversion(self):
+        """Test that pages converted line by line (--stream-above) match the in-memory conversion"""
+        self.create_test_file('pages/Big.md',
+            "---\ntitle: Big\n---\ntags:: logs, [[Pasted Output]]\n"
+            "- TODO Pasted log\n  id:: 64f5a1b2-0000-4000-8000-000000000009\n  scheduled:: [[2023_09_10]]\n"
+            "  created:: 2023-09-01\n  line [[2023_09_04]] #[[Big Tag]]\n\n- See ((64f5a1b2-0000-4000-8000-000000000009))  \n\n  \n")
+        self.create_test_file('pages/Broken.md', "---\nbad: yaml: here\n---\n- DONE Item\n")
+        self.create_test_file('journals/2023_09_04.md', "- LATER Review [[Big]]\n")
+
+        outputs = []
+        for stream_above in ('1000', '0'):
+            output_dir = os.path.join(self.test_dir, 'output-' + stream_above)
+            result = self.run_script([
+                '--src', self.test_dir, '--out', output_dir, '--stream-above', stream_above, '--exclude', 'output-*',
+                '--frontmatter', '--status-tags', '--rename-journals', '--incremental'
+            ])
+            self.assertEqual(result.returncode, 0)
+            pages = {}
+            for rel in ('pages/Big.md', 'pages/Broken.md', 'journals/2023-09-04.md'):
+                with open(os.path.join(output_dir, rel), 'r', encoding='utf-8') as f:
+                    pages[rel] = f.read()
+            outputs.append(pages)
+            # streamed pages are recorded in the manifest like any other page
+            result = self.run_script([
+                '--src', self.test_dir, '--out', output_dir, '--stream-above', stream_above, '--exclude', 'output-*',
+                '--frontmatter', '--status-tags', '--rename-journals', '--incremental'
+            ])
+            self.assertIn('Skipped 3 unchanged files', result.stdout)
+
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn('tags:\n- logs\n- pasted-output', outputs[1]['pages/Big.md'])
+        self.assertTrue(outputs[1]['pages/Big.md'].endswith('- See [[Big#^64f5a1b2-0000-4000-8000-000000000009]]\n'))
+        self.assertFalse([fn for fn in os.listdir(os.path.join(self.test_dir, 'output-0', 'pages')) if fn.endswith('.l2o-tmp')])
+
+        # a dry run tells changed from unchanged streamed pages without spooling their output
+        self.create_test_file('pages/Same.md', "---\ntitle: Same\n---\n- Plain\n")
+        counts = []
+        for stream_above in ('1000', '0'):
+            result = self.run_script(['--src', self.test_dir, '--dry-run', '--stream-above', stream_above, '--exclude', 'output-*',
+                                      '--frontmatter', '--status-tags'])
+            self.assertEqual(result.returncode, 0)
+            counts.append(result.stdout.split('.')[0])
+        self.assertEqual(counts, ['Processed 4 files; changed 3'] * 2)
+
+    def test_spilled_uuid_index(self):
+        """Test that a UUID index spilled to SQLite (--index-spill) resolves refs like the in-memory one"""
+        import json
+        from types import SimpleNamespace
+        from logseq_to_obsidian import Graph
+        self.create_test_file('pages/A.md', "- Alpha\n  id:: 64f5a1b2-0000-4000-8000-00000000000a\n- Short\n  id:: short-id\n")
+        self.create_test_file('pages/B.md', "- Beta\n  id:: 64f5a1b2-0000-4000-8000-00000000000b\n- Dup\n  id:: 64f5a1b2-0000-4000-8000-00000000000a\n")
+        self.create_test_file('pages/C.md', "- ((64f5a1b2-0000-4000-8000-00000000000a)) ((64f5a1b2-0000-4000-8000-00000000000b)) ((short-id))\n")
+
+        outputs = []
+        for spill in ('0', '1'):
+            output_dir = os.path.join(self.test_dir, 'output-' + spill)
+            stats_file = os.path.join(self.test_dir, 'stats-%s.json' % spill)
+            result = self.run_script([
+                '--src', self.test_dir, '--out', output_dir, '--exclude', 'output-*',
+                '--index-spill', spill, '--jobs', '2', '--stats-json', stats_file
+            ])
+            self.assertEqual(result.returncode, 0)
+            self.assertIn('uuid index: 3 ids in 3 pages', result.stdout)
+            with open(os.path.join(output_dir, 'pages', 'C.md'), 'r', encoding='utf-8') as f:
+                outputs.append(f.read())
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)['index']
+            self.assertEqual(index['backend'], 'memory' if spill == '0' else 'sqlite')
+            self.assertEqual(index['uuids'], 3)
+
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn('[[B#^64f5a1b2-0000-4000-8000-00000000000b]]', outputs[1])
+
+        # removing the first owner of a duplicated id hands it to the other page
+        graph = Graph(self.test_dir, SimpleNamespace(index_spill=1))
+        graph.add('pages/A.md', ['64f5a1b2-0000-4000-8000-00000000000a', 'short-id'])
+        graph.add('pages/B.md', ['64f5a1b2-0000-4000-8000-00000000000b', '64f5a1b2-0000-4000-8000-00000000000a'])
+        self.assertEqual(graph.footprint()['backend'], 'sqlite')
+        graph.remove('pages/A.md')
+        self.assertEqual(graph.link_title('64f5a1b2-0000-4000-8000-00000000000a'), 'B')
+        self.assertNotIn('short-id', graph)
+        self.assertEqual(graph.page_uids('pages/B.md'), ['64f5a1b2-0000-4000-8000-00000000000b', '64f5a1b2-0000-4000-8000-00000000000a'])
+
+    def test_referenced_assets(self):
+        """Test that --referenced-assets rewrites asset links and copies only used assets, sharing duplicates"""
+        self.create_test_file('assets/image_1.png', "same bytes")
+        self.create_test_file('assets/image_2.png', "same bytes")
+        self.create_test_file('assets/My File.pdf', "pdf")
+        self.create_test_file('assets/unused.png', "orphan")
+        self.create_test_file('assets/sub/photo.png', "one")
+        self.create_test_file('assets/photo.png', "two")
+        self.create_test_file('pages/Gallery.md',
+            "- ![image.png](../assets/image_1.png){:height 225, :width 400}\n"
+            "- ![copy](../assets/image_2.png) [Report](../assets/My%20File.pdf)\n"
+            "- ![a](../assets/sub/photo.png) ![b](../assets/photo.png) ![gone](../assets/missing.png)\n")
+        output_dir = os.path.join(self.test_dir, 'output')
+
+        result = self.run_script([
+            '--src', self.test_dir, '--out', output_dir, '--referenced-assets', '--list-orphans'
+        ])
+
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Referenced 5 assets (1 stored as shared copies); 1 orphaned assets', result.stdout)
+        self.assertIn('ORPHAN: assets/unused.png', result.stdout)
+        with open(os.path.join(output_dir, 'pages', 'Gallery.md'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(),
+                "- ![[image_1.png|400]]\n"
+                "- ![[image_2.png]] [[My File.pdf|Report]]\n"
+                "- ![[assets/sub/photo.png]] ![[assets/photo.png]] ![gone](../assets/missing.png)\n")
+        self.assertFalse(os.path.exists(os.path.join(output_dir, 'assets', 'unused.png')))
+        for rel in ('image_1.png', 'image_2.png', 'My File.pdf', 'photo.png', 'sub/photo.png'):
+            self.assertTrue(os.path.exists(os.path.join(output_dir, 'assets', rel)))
+        with open(os.path.join(output_dir, 'assets', 'image_2.png'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "same bytes")
+
+        # without the option, links are left alone and every asset is copied
+        plain_dir = os.path.join(self.test_dir, 'plain')
+        result = self.run_script(['--src', self.test_dir, '--out', plain_dir, '--exclude', 'output'])
+        self.assertEqual(result.returncode, 0)
+        self.assertTrue(os.path.exists(os.path.join(plain_dir, 'assets', 'unused.png')))
+        with open(os.path.join(plain_dir, 'pages', 'Gallery.md'), 'r', encoding='utf-8') as f:
+            self.assertIn('![copy](../assets/image_2.png)', f.read())
+
+        # --incremental relinks pages when an asset they name appears, or gains a namesake
+        args = ['--src', self.test_dir, '--out', os.path.join(self.test_dir, 'incremental'),
+                '--exclude', 'output', '--exclude', 'plain', '--referenced-assets', '--incremental']
+        self.assertEqual(self.run_script(args).returncode, 0)
+        self.create_test_file('assets/missing.png', "late")
+        self.create_test_file('assets/sub/image_2.png', "namesake")
+        result = self.run_script(args)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Processed 1 files', result.stdout)
+        with open(os.path.join(self.test_dir, 'incremental', 'pages', 'Gallery.md'), 'r', encoding='utf-8') as f:
+            content = f.read()
+        self.assertIn('![[missing.png]]', content)
+        self.assertIn('![[assets/image_2.png]]', content)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'incremental', 'assets', 'missing.png')))
+
+    def test_embed_conversion(self):
+        """Test that {{embed}} macros become ![[...]] embeds, or are inlined with --inline-embeds"""
+        self.create_test_file('pages/Source.md',
+            "- TODO Target block [[Other]]\n  id:: 64f5a1b2-0000-4000-8000-0000000000e1\n"
+            "\t- child #[[Big Tag]]\n"
+            "\t- loop {{embed ((64f5a1b2-0000-4000-8000-0000000000e1))}}\n")
+        self.create_test_file('pages/Host.md',
+            "- Intro\n\t- {{embed ((64f5a1b2-0000-4000-8000-0000000000e1))}}\n"
+            "- {{embed [[Source]]}}\n"
+            "- {{embed ((64f5a1b2-0000-4000-8000-0000000000ff))}}\n")
+
+        output_dir = os.path.join(self.test_dir, 'output')
+        result = self.run_script(['--src', self.test_dir, '--out', output_dir])
+        self.assertEqual(result.returncode, 0)
+        with open(os.path.join(output_dir, 'pages', 'Host.md'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(),
+                "- Intro\n\t- ![[Source#^64f5a1b2-0000-4000-8000-0000000000e1]]\n"
+                "- ![[Source]]\n"
+                "- {{embed ((64f5a1b2-0000-4000-8000-0000000000ff))}}\n")
+
+        inline_dir = os.path.join(self.test_dir, 'inline')
+        result = self.run_script([
+            '--src', self.test_dir, '--out', inline_dir, '--exclude', 'output', '--inline-embeds', '--incremental'
+        ])
+        self.assertEqual(result.returncode, 0)
+        host = os.path.join(inline_dir, 'pages', 'Host.md')
+        with open(host, 'r', encoding='utf-8') as f:
+            # an embed of a block (or page) already being inlined stays a link
+            self.assertEqual(f.read(),
+                "- Intro\n"
+                "\t- [ ] Target block [[Other]]\n"
+                "\t\t- child #big-tag\n"
+                "\t\t- loop ![[Source#^64f5a1b2-0000-4000-8000-0000000000e1]]\n"
+                "- [[Source]]\n"
+                "\t- [ ] Target block [[Other]]\n"
+                "\t\t- child #big-tag\n"
+                "\t\t- loop [ ] Target block [[Other]]\n"
+                "\t\t\t- child #big-tag\n"
+                "\t\t\t- loop ![[Source#^64f5a1b2-0000-4000-8000-0000000000e1]]\n"
+                "- {{embed ((64f5a1b2-0000-4000-8000-0000000000ff))}}\n")
+
+        # an inlined page is not transcluded as well, which would show it twice
+        with open(host, 'r', encoding='utf-8') as f:
+            content = f.read()
+        self.assertFalse('![[Source]]' in content and 'child #big-tag' in content)
+
+        # in place, an embedded page may already have been rewritten when its embed is inlined
+        result = self.run_script(['--src', self.test_dir, '--inline-embeds'])
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('--inline-embeds needs a separate --out vault', result.stderr)
+
+        # editing the embedded page reconverts the pages that inline it
+        self.create_test_file('pages/Source.md',
+            "- DONE Target block\n  id:: 64f5a1b2-0000-4000-8000-0000000000e1\n")
+        result = self.run_script([
+            '--src', self.test_dir, '--out', inline_dir, '--exclude', 'output', '--inline-embeds', '--incremental'
+        ])
+        self.assertIn('Processed 2 files', result.stdout)
+        with open(host, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "- Intro\n\t- [x] Target block\n- [[Source]]\n\t- [x] Target block\n- {{embed ((64f5a1b2-0000-4000-8000-0000000000ff))}}\n")
+
+        # a block changing owner (its page deleted, a namesake id elsewhere) reaches pages inlining it through others
+        for name in ('Old', 'Zed'):
+            self.create_test_file('chain/pages/%s.md' % name, "- %s text\n  id:: 64f5a1b2-0000-4000-8000-0000000000e2\n" % name)
+        self.create_test_file('chain/pages/Mid.md', "- {{embed ((64f5a1b2-0000-4000-8000-0000000000e2))}}\n")
+        self.create_test_file('chain/pages/Top.md', "- {{embed [[Mid]]}}\n")
+        args = ['--src', os.path.join(self.test_dir, 'chain'), '--out', os.path.join(self.test_dir, 'chain-out'), '--inline-embeds', '--incremental']
+        self.assertEqual(self.run_script(args).returncode, 0)
+        top = os.path.join(self.test_dir, 'chain-out', 'pages', 'Top.md')
+        with open(top, 'r', encoding='utf-8') as f:
+            owner = 'Old' if 'Old text' in f.read() else 'Zed'
+        os.remove(os.path.join(self.test_dir, 'chain', 'pages', owner + '.md'))
+        self.assertEqual(self.run_script(args).returncode, 0)
+        with open(top, 'r', encoding='utf-8') as f:
+            self.assertIn('%s text' % ('Zed' if owner == 'Old' else 'Old'), f.read())
+
+    def test_in_place_journal_rename(self):
+        """Test that an in-place migration writes renamed journals under their new name only"""
+        self.create_test_file('journals/2023_09_04.md', "- TODO Review\n")
+        
+        result = self.run_script(['--src', self.test_dir, '--rename-journals'])
+        
+        self.assertEqual(result.returncode, 0)
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'journals', '2023_09_04.md')))
+        with open(os.path.join(self.test_dir, 'journals', '2023-09-04.md'), 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "- [ ] Review\n")
+    
     def test_property_stripping(self):
         """Test stripping of Logseq properties"""
         content = """# Test Properties
@@ -321,6 +647,401 @@ Another link: [[2022_12_25]]
         self.assertIn('DEADLINE: <2023-09-15 Fri>', output_content)
         self.assertIn('DUE: <2023-09-20 Wed>', output_content)
     
+    def test_block_anchor_and_code_fences(self):
+        """Test that id:: anchors attach to their block and code fences are left alone"""
+        content = """- TODO Referenced task
+  id:: 64f5a1b2-0000-4000-8000-000000000001
+- See ((64f5a1b2-0000-4000-8000-000000000001))
+```
+- TODO not a task #[[Not A Tag]]
+```
+- DONE After the fence
+"""
+        self.create_test_file('pages/Anchors.md', content)
+        
+        result = self.run_script([
+            '--src', self.test_dir,
+            '--out', os.path.join(self.test_dir, 'output'),
+            '--status-tags',
+            '--strip-properties'
+        ])
+        
+        self.assertEqual(result.returncode, 0)
+        
+        output_file = os.path.join(self.test_dir, 'output', 'pages', 'Anchors.md')
+        with open(output_file, 'r', encoding='utf-8') as f:
+            output_content = f.read()
+        
+        # The anchor lands on the block line before the status tag is appended
+        self.assertIn('- [ ] Referenced task ^64f5a1b2-0000-4000-8000-000000000001 #status/todo', output_content)
+        self.assertNotIn('id::', output_content)
+        self.assertIn('[[Anchors#^64f5a1b2-0000-4000-8000-000000000001]]', output_content)
+        # Fenced lines pass through untouched
+        self.assertIn('- TODO not a task #[[Not A Tag]]', output_content)
+        self.assertIn('- [x] After the fence #status/done', output_content)
+    
+    def test_rerun_into_existing_output(self):
+        """Test that a second run converts from the source again instead of the previous output"""
+        self.create_test_file('pages/Rerun.md', "- TODO Task\n")
+        args = ['--src', self.test_dir, '--out', os.path.join(self.test_dir, 'output'), '--status-tags']
+        
+        self.assertEqual(self.run_script(args).returncode, 0)
+        result = self.run_script(args)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Processed 1 files', result.stdout)
+        
+        output_file = os.path.join(self.test_dir, 'output', 'pages', 'Rerun.md')
+        with open(output_file, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "- [ ] Task #status/todo\n")
+    
+    def test_unchanged_output_is_not_rewritten(self):
+        """Test that pages whose output already matches are left untouched, mtime included"""
+        self.create_test_file('pages/Same.md', "- TODO Same\n")
+        self.create_test_file('pages/Edited.md', "- TODO Before\n")
+        self.create_test_file('pages/Huge.md', "- DONE Streamed because it is longer than twenty bytes\n")
+        output_dir = os.path.join(self.test_dir, 'output')
+        # Huge.md is above --stream-above (about 20 bytes) and goes through the streaming writer
+        args = ['--src', self.test_dir, '--out', output_dir, '--exclude', 'output', '--stream-above', '0.00002', '--fsync']
+        
+        result = self.run_script(args)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Wrote 3 pages', result.stdout)
+        outputs = {name: os.path.join(output_dir, 'pages', name) for name in ('Same.md', 'Edited.md', 'Huge.md')}
+        for fp in outputs.values():
+            os.utime(fp, ns=(1000000000, 1000000000))
+        
+        self.create_test_file('pages/Edited.md', "- TODO After\n")
+        result = self.run_script(args)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Wrote 1 pages', result.stdout)
+        self.assertIn('2 already up to date', result.stdout)
+        self.assertEqual(os.stat(outputs['Same.md']).st_mtime_ns, 1000000000)
+        self.assertEqual(os.stat(outputs['Huge.md']).st_mtime_ns, 1000000000)
+        with open(outputs['Edited.md'], 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), "- [ ] After\n")
+        self.assertFalse([fn for fn in os.listdir(os.path.join(output_dir, 'pages')) if fn.endswith('.l2o-tmp')])
+    
+    def test_sharded_migration(self):
+        """Test that --shard runs, with and without a merged --shard-index, match a single run"""
+        for n in range(6):
+            self.create_test_file('pages/Page %d.md' % n,
+                "- Block %d\n  id:: 64f5a1b2-0000-4000-8000-00000000010%d\n"
+                "- See ((64f5a1b2-0000-4000-8000-00000000010%d)) [[2023_09_0%d]]\n" % (n, n, (n + 1) % 6, n + 1))
+            self.create_test_file('journals/2023_09_0%d.md' % (n + 1), "- TODO Day %d\n" % n)
+        # a duplicated id goes to the first page in path order, in full and sharded runs alike
+        self.create_test_file('pages/Dup.md', "- Copy\n  id:: 64f5a1b2-0000-4000-8000-000000000101\n")
+        self.create_test_file('assets/image.png', "png")
+        full_dir = os.path.join(self.test_dir, 'full')
+        flags = ['--exclude', 'full', '--exclude', 'sharded*', '--exclude', 'index', '--rename-journals']
+        self.assertEqual(self.run_script(['--src', self.test_dir, '--out', full_dir] + flags).returncode, 0)
+
+        index_dir = os.path.join(self.test_dir, 'index')
+        for two_phase in (False, True):
+            out_dir = os.path.join(self.test_dir, 'sharded-%s' % two_phase)
+            extra = ['--shard-index', index_dir] if two_phase else []
+            if two_phase:
+                result = self.run_script(['--src', self.test_dir, '--out', out_dir, '--shard', '2/2'] + flags + extra)
+                self.assertNotEqual(result.returncode, 0)
+                self.assertIn('run them with --index-only first', result.stderr)
+                for shard in ('1/2', '2/2'):
+                    result = self.run_script(['--src', self.test_dir, '--out', out_dir, '--shard', shard, '--index-only'] + flags + extra)
+                    self.assertEqual(result.returncode, 0)
+                self.assertEqual(sorted(os.listdir(index_dir)), ['index-1-of-2.json', 'index-2-of-2.json'])
+            processed = 0
+            for shard in ('1/2', '2/2'):
+                result = self.run_script(['--src', self.test_dir, '--out', out_dir, '--shard', shard] + flags + extra)
+                self.assertEqual(result.returncode, 0)
+                self.assertIn('Shard %s:' % shard, result.stdout)
+                processed += int(result.stdout.split('Processed ')[1].split()[0])
+            self.assertEqual(processed, 13)
+            for rel in ['pages/Page %d.md' % n for n in range(6)] + ['journals/2023-09-0%d.md' % (n + 1) for n in range(6)] + ['assets/image.png']:
+                with open(os.path.join(full_dir, rel), 'r', encoding='utf-8') as f, open(os.path.join(out_dir, rel), 'r', encoding='utf-8') as g:
+                    self.assertEqual(f.read(), g.read())
+
+        # in place, only the two-phase flow works: a later shard would index pages an earlier one converted
+        graph = os.path.join(self.test_dir, 'sharded-in-place')
+        shutil.copytree(os.path.join(self.test_dir, 'pages'), os.path.join(graph, 'pages'))
+        shutil.copytree(os.path.join(self.test_dir, 'journals'), os.path.join(graph, 'journals'))
+        flags = ['--src', graph, '--rename-journals', '--strip-properties']
+        result = self.run_script(flags + ['--shard', '1/2'])
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('--shard needs --shard-index', result.stderr)
+        index_dir = os.path.join(self.test_dir, 'index-in-place')
+        for shard in ('1/2', '2/2'):
+            self.assertEqual(self.run_script(flags + ['--shard', shard, '--shard-index', index_dir, '--index-only']).returncode, 0)
+        processed = 0
+        for shard in ('1/2', '2/2'):
+            result = self.run_script(flags + ['--shard', shard, '--shard-index', index_dir])
+            self.assertEqual(result.returncode, 0)
+            processed += int(result.stdout.split('Processed ')[1].split()[0])
+        # a journal renamed by one shard is not picked up again by the other
+        self.assertEqual(processed, 13)
+        with open(os.path.join(graph, 'pages', 'Page 0.md'), 'r', encoding='utf-8') as f:
+            self.assertIn('[[Dup#^64f5a1b2-0000-4000-8000-000000000101]]', f.read())
+
+    def test_resume_interrupted_migration(self):
+        """Test that --resume finishes an interrupted in-place run, converting each page exactly once"""
+        graphs = {name: os.path.join(self.test_dir, name) for name in ('clean', 'crashed')}
+        # journals renamed in place must not be picked up again under their new name
+        rels = ['pages/Page 0.md', 'pages/Page 1.md'] + ['journals/2023_09_0%d.md' % d for d in range(1, 5)]
+        for name in graphs:
+            for n, rel in enumerate(rels):
+                self.create_test_file('%s/%s' % (name, rel),
+                    "- TODO Block %d\n  id:: 64f5a1b2-0000-4000-8000-00000000020%d\n"
+                    "- See ((64f5a1b2-0000-4000-8000-00000000020%d))\n" % (n, n, (n + 1) % len(rels)))
+        flags = ['--status-tags', '--strip-properties', '--rename-journals']
+        self.assertEqual(self.run_script(['--src', graphs['clean']] + flags).returncode, 0)
+
+        # the fifth conversion dies, as an out-of-memory kill or a bad file would
+        crash = ("import sys; sys.path.insert(0, %r); import logseq_to_obsidian as m\n"
+                 "convert, calls = m.convert_file, []\n"
+                 "def convert_file(*args, **kwargs):\n"
+                 "    calls.append(args)\n"
+                 "    if len(calls) == 5: raise MemoryError('killed')\n"
+                 "    return convert(*args, **kwargs)\n"
+                 "m.convert_file = convert_file; m.main()\n") % os.path.dirname(os.path.abspath(self.script_path))
+        result = subprocess.run(['python3', '-c', crash, '--src', graphs['crashed']] + flags, capture_output=True, text=True)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertTrue(os.path.exists(os.path.join(graphs['crashed'], '.logseq-to-obsidian.checkpoint.json')))
+
+        # with --io-concurrency, pages are journaled as they finish too, not only once every page is done
+        threaded = os.path.join(self.test_dir, 'threaded')
+        for n, rel in enumerate(rels):
+            self.create_test_file('threaded/%s' % rel, "- TODO Block %d\n" % n)
+        result = subprocess.run(['python3', '-c', crash, '--src', threaded, '--io-concurrency', '2'] + flags, capture_output=True, text=True)
+        self.assertNotEqual(result.returncode, 0)
+        with open(os.path.join(threaded, '.logseq-to-obsidian.journal'), 'r', encoding='utf-8') as f:
+            self.assertGreaterEqual(f.read().count('"done"'), 4)
+
+        # starting over in place would convert the finished pages a second time
+        result = self.run_script(['--src', graphs['crashed']] + flags)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('pass --resume', result.stderr)
+
+        result = self.run_script(['--src', graphs['crashed'], '--resume'] + flags)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Processed 2 files', result.stdout)
+        self.assertIn('4 pages were already converted', result.stdout)
+        self.assertFalse([f for f in os.listdir(graphs['crashed']) if f.startswith('.logseq-to-obsidian')])
+        for folder in ('pages', 'journals'):
+            self.assertEqual(sorted(os.listdir(os.path.join(graphs['clean'], folder))), sorted(os.listdir(os.path.join(graphs['crashed'], folder))))
+            for name in os.listdir(os.path.join(graphs['clean'], folder)):
+                with open(os.path.join(graphs['clean'], folder, name), 'r', encoding='utf-8') as f, \
+                        open(os.path.join(graphs['crashed'], folder, name), 'r', encoding='utf-8') as g:
+                    self.assertEqual(f.read(), g.read())
+
+    def test_incremental_rerun(self):
+        """Test that --incremental only reconverts changed pages and pages referencing moved blocks"""
+        self.create_test_file('pages/Target.md', "- Block\n  id:: 64f5a1b2-0000-4000-8000-000000000002\n")
+        self.create_test_file('pages/Referrer.md', "- See ((64f5a1b2-0000-4000-8000-000000000002))\n")
+        self.create_test_file('pages/Other.md', "- Unrelated\n")
+        args = ['--src', self.test_dir, '--out', os.path.join(self.test_dir, 'output'), '--incremental']
+        
+        result = self.run_script(args)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Processed 3 files', result.stdout)
+        
+        result = self.run_script(args)
+        self.assertIn('Processed 0 files', result.stdout)
+        self.assertIn('Skipped 3 unchanged files', result.stdout)
+        
+        # Moving the block to a new page must also reconvert the page that references it
+        self.create_test_file('pages/Target.md', "- Block moved away\n")
+        self.create_test_file('pages/New Target.md', "- Block\n  id:: 64f5a1b2-0000-4000-8000-000000000002\n")
+        result = self.run_script(args)
+        self.assertIn('Processed 3 files', result.stdout)
+        self.assertIn('Skipped 1 unchanged files', result.stdout)
+        
+        with open(os.path.join(self.test_dir, 'output', 'pages', 'Referrer.md'), 'r', encoding='utf-8') as f:
+            self.assertIn('[[New Target#^64f5a1b2-0000-4000-8000-000000000002]]', f.read())
+
+        # Deleting a page removes its output from the vault
+        os.remove(os.path.join(self.test_dir, 'pages', 'Other.md'))
+        result = self.run_script(args)
+        self.assertIn('Removed 1 pages deleted from the graph', result.stdout)
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'output', 'pages', 'Other.md')))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'output', 'pages', 'Target.md')))
+
+    def test_incremental_removes_dropped_assets(self):
+        """Test that --incremental removes copied assets that were deleted from the graph or are no longer referenced"""
+        self.create_test_file('pages/Page.md', "- ![a](../assets/a.png)\n- ![b](../assets/b.png)\n")
+        for name in ('a.png', 'b.png', 'gone.pdf'):
+            self.create_test_file('assets/' + name, name)
+        all_dir = os.path.join(self.test_dir, 'all')
+        used_dir = os.path.join(self.test_dir, 'used')
+
+        for out in (all_dir, used_dir):
+            result = self.run_script(['--src', self.test_dir, '--out', out, '--incremental', '--exclude', 'all', '--exclude', 'used']
+                                     + (['--referenced-assets'] if out == used_dir else []))
+            self.assertEqual(result.returncode, 0)
+        self.assertEqual(sorted(os.listdir(os.path.join(all_dir, 'assets'))), ['a.png', 'b.png', 'gone.pdf'])
+        self.assertEqual(sorted(os.listdir(os.path.join(used_dir, 'assets'))), ['a.png', 'b.png'])
+
+        # a deleted asset leaves every vault; an asset the pages stop using leaves the --referenced-assets one
+        os.remove(os.path.join(self.test_dir, 'assets', 'gone.pdf'))
+        self.create_test_file('pages/Page.md', "- ![a](../assets/a.png)\n")
+        result = self.run_script(['--src', self.test_dir, '--out', all_dir, '--incremental', '--exclude', 'all', '--exclude', 'used'])
+        self.assertIn('Removed 0 pages deleted from the graph and 1 assets no longer copied', result.stdout)
+        self.assertEqual(sorted(os.listdir(os.path.join(all_dir, 'assets'))), ['a.png', 'b.png'])
+        result = self.run_script(['--src', self.test_dir, '--out', used_dir, '--incremental', '--exclude', 'all', '--exclude', 'used', '--referenced-assets', '--dry-run'])
+        self.assertIn('1 assets no longer copied', result.stdout)
+        self.assertEqual(sorted(os.listdir(os.path.join(used_dir, 'assets'))), ['a.png', 'b.png'])
+        result = self.run_script(['--src', self.test_dir, '--out', used_dir, '--incremental', '--exclude', 'all', '--exclude', 'used', '--referenced-assets'])
+        self.assertIn('1 assets no longer copied', result.stdout)
+        self.assertEqual(os.listdir(os.path.join(used_dir, 'assets')), ['a.png'])
+
+    def test_exclude_and_skip_bak(self):
+        """Test that --skip-bak and --exclude keep backups and matching files out of the vault"""
+        self.create_test_file('pages/Keep.md', "- Keep me\n")
+        self.create_test_file('logseq/bak/pages/Keep/2023_09_04T10_00_00.000Z.Desktop.md', "- Old copy\n")
+        self.create_test_file('assets/image.png', "png")
+        self.create_test_file('assets/scratch.tmp', "tmp")
+        
+        result = self.run_script([
+            '--src', self.test_dir,
+            '--out', os.path.join(self.test_dir, 'output'),
+            '--skip-bak',
+            '--exclude', '*.tmp'
+        ])
+        
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Processed 1 files', result.stdout)
+        
+        output_dir = os.path.join(self.test_dir, 'output')
+        self.assertTrue(os.path.exists(os.path.join(output_dir, 'pages', 'Keep.md')))
+        self.assertTrue(os.path.exists(os.path.join(output_dir, 'assets', 'image.png')))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, 'assets', 'scratch.tmp')))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, 'logseq', 'bak')))
+    
+    def test_default_excludes_and_include(self):
+        """Test that backups, hidden folders and node_modules are skipped by default and --include re-admits them"""
+        self.create_test_file('pages/Keep.md', "- Keep me\n")
+        self.create_test_file('logseq/bak/pages/Keep/2023_09_04T10_00_00.000Z.Desktop.md', "- Old copy\n")
+        self.create_test_file('logseq/.recycle/pages_Gone.md', "- Deleted\n")
+        self.create_test_file('logseq/custom.css', "body {}")
+        self.create_test_file('.git/HEAD', "ref: refs/heads/main")
+        self.create_test_file('assets/node_modules/pkg/README.md', "- Vendored\n")
+        
+        output_dir = os.path.join(self.test_dir, 'output')
+        result = self.run_script(['--src', self.test_dir, '--out', output_dir, '--include', '.recycle'])
+        
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Processed 2 files', result.stdout)
+        self.assertTrue(os.path.exists(os.path.join(output_dir, 'logseq', 'custom.css')))
+        self.assertTrue(os.path.exists(os.path.join(output_dir, 'logseq', '.recycle', 'pages_Gone.md')))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, 'logseq', 'bak')))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, '.git')))
+        self.assertFalse(os.path.exists(os.path.join(output_dir, 'assets', 'node_modules')))
+        
+        result = self.run_script(['--src', self.test_dir, '--out', os.path.join(self.test_dir, 'everything'),
+                                  '--no-default-excludes', '--exclude', 'output'])
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('Processed 4 files', result.stdout)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'everything', '.git', 'HEAD')))
+    
+    def test_date_parsing_and_helper_caches(self):
+        """Test the date formats to_iso_date accepts and the memoized helper counters"""
+        import logseq_to_obsidian as l2o
+        
+        self.assertEqual(l2o.to_iso_date('[[2023_09_04]]'), '2023-09-04')
+        self.assertEqual(l2o.to_iso_date('2023-9-4'), '2023-09-04')
+        self.assertEqual(l2o.to_iso_date('Sep 4, 2023'), '2023-09-04')
+        self.assertEqual(l2o.to_iso_date('4 September 2023'), '2023-09-04')
+        self.assertIsNone(l2o.to_iso_date('Feb 30, 2023'))
+        self.assertIsNone(l2o.to_iso_date('next tuesday'))
+        
+        l2o.slug.cache_clear()
+        l2o.slug('Tag With Spaces'); l2o.slug('Tag With Spaces')
+        stats = l2o.cache_stats()
+        self.assertEqual(stats['slug']['hits'], 1)
+        self.assertEqual(stats['slug']['misses'], 1)
+        self.assertIn('to_iso_date', stats)
+    
+    def test_stats_json(self):
+        """Test that --stats-json writes per-phase timings and the slowest pages"""
+        import json
+        self.create_test_file('pages/One.md', "- TODO One #[[Tag]]\n")
+        self.create_test_file('pages/Two.md', "- DONE Two\n")
+        stats_file = os.path.join(self.test_dir, 'stats.json')
+        
+        result = self.run_script([
+            '--src', self.test_dir,
+            '--out', os.path.join(self.test_dir, 'output'),
+            '--stats-json', stats_file,
+            '--stats-top', '1'
+        ])
+        
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('convert', result.stdout)
+        with open(stats_file, 'r', encoding='utf-8') as f:
+            stats = json.load(f)
+        
+        for name in ('scan', 'copy', 'read', 'index', 'convert'):
+            self.assertIn(name, stats['phases'])
+        self.assertEqual(stats['phases']['convert']['files'], 2)
+        self.assertGreater(stats['phases']['convert']['bytes_written'], 0)
+        self.assertEqual(len(stats['slowest']), 1)
+        self.assertIn('slug', stats['caches'])
+    
+    def test_library_api(self):
+        """Test converting pages in memory with convert_text, ConversionOptions and Graph"""
+        import logseq_to_obsidian as l2o
+        
+        graph = l2o.Graph()
+        graph.add_text('pages/Target.md', "- Block\n  id:: 64f5a1b2-0000-4000-8000-000000000003\n")
+        opts = l2o.ConversionOptions(status_tags=True, strip_properties=True)
+        
+        converted = l2o.convert_text("- TODO See ((64f5a1b2-0000-4000-8000-000000000003))\n", 'pages/Source.md', graph, opts)
+        self.assertEqual(converted, "- [ ] See [[Target#^64f5a1b2-0000-4000-8000-000000000003]] #status/todo\n")
+
+        # Inlined embeds come from the text given to add_text, not from files under the working directory
+        inline = l2o.ConversionOptions(inline_embeds=True)
+        self.assertEqual(graph.convert("- {{embed ((64f5a1b2-0000-4000-8000-000000000003))}}\n", 'pages/Host.md', inline),
+                         "- Block\n")
+        
+        # A plain mapping works as an index too, and unknown ids are left alone
+        self.assertEqual(l2o.convert_text("((64f5a1b2))\n", 'x.md', {}), "((64f5a1b2))\n")
+        
+        # Removing the page drops its ids from the index
+        graph.remove('pages/Target.md')
+        self.assertNotIn('64f5a1b2-0000-4000-8000-000000000003', graph)
+        self.assertEqual(graph.convert("((64f5a1b2-0000-4000-8000-000000000003))\n", 'x.md'),
+                         "((64f5a1b2-0000-4000-8000-000000000003))\n")
+    
+    def test_watch_mode(self):
+        """Test that --watch reconverts edited pages and pages referencing moved blocks"""
+        import signal
+        import time
+        self.create_test_file('src/pages/Target.md', "- Block\n  id:: 64f5a1b2-0000-4000-8000-000000000004\n")
+        self.create_test_file('src/pages/Referrer.md', "- See ((64f5a1b2-0000-4000-8000-000000000004))\n")
+        src = os.path.join(self.test_dir, 'src')
+        out = os.path.join(self.test_dir, 'output')
+        referrer = os.path.join(out, 'pages', 'Referrer.md')
+        
+        proc = subprocess.Popen(['python3', self.script_path, '--src', src, '--out', out,
+                                 '--watch', '--watch-interval', '0.1'],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        try:
+            self.assertIn('Processed 2 files', proc.stdout.readline())
+            self.assertIn('Watching', proc.stdout.readline())
+            
+            self.create_test_file('src/pages/Target.md', "- Block moved away\n")
+            self.create_test_file('src/pages/New Target.md', "- Block\n  id:: 64f5a1b2-0000-4000-8000-000000000004\n")
+            
+            expected = '[[New Target#^64f5a1b2-0000-4000-8000-000000000004]]'
+            deadline = time.time() + 10
+            content = ''
+            while time.time() < deadline and expected not in content:
+                time.sleep(0.1)
+                with open(referrer, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            self.assertIn(expected, content)
+            with open(os.path.join(out, 'pages', 'Target.md'), 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), "- Block moved away\n")
+        finally:
+            proc.send_signal(signal.SIGINT)
+            proc.communicate(timeout=10)
+    
     def test_error_handling(self):
         """Test error handling with malformed files"""
         # Create file with malformed YAML frontmatter
@@ -346,7 +1067,22 @@ Some content.
         # Check that file was still processed
         output_file = os.path.join(self.test_dir, 'output', 'pages', 'Malformed YAML.md')
         self.assertTrue(os.path.exists(output_file))
-    
+
+    def test_frontmatter_that_is_not_a_mapping(self):
+        """Test that a YAML list or string between --- lines is kept as body text instead of crashing the run"""
+        self.create_test_file('pages/List.md', "---\n- a\n- b\n---\n- TODO Task\n")
+        self.create_test_file('pages/String.md', "---\njust a string\n---\n- Block\n")
+        output_dir = os.path.join(self.test_dir, 'output')
+
+        for extra in ([], ['--stream-above', '0']):
+            result = self.run_script(['--src', self.test_dir, '--out', output_dir, '--frontmatter', '--status-tags'] + extra)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            # no header is added in front of the block, which would give the page two frontmatter blocks
+            with open(os.path.join(output_dir, 'pages', 'List.md'), 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), "---\n- a\n- b\n---\n- [ ] Task #status/todo\n")
+            with open(os.path.join(output_dir, 'pages', 'String.md'), 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), "---\njust a string\n---\n- Block\n")
+
     def test_dry_run_mode(self):
         """Test dry-run mode"""
         content = """# Test Dry Run
@@ -364,16 +1100,30 @@ Some content.
         
         self.assertEqual(result.returncode, 0)
         
-        # In dry-run mode, the script still creates the directory structure and copies files
-        # This is the actual behavior of the script - it copies files but doesn't modify them
-        output_file = os.path.join(self.test_dir, 'output', 'pages', 'Test Dry Run.md')
-        # The file should exist and contain the original content
-        self.assertTrue(os.path.exists(output_file))
+        # A dry run previews the migration without writing anything
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'output')))
+        self.assertIn('Processed 1 files', result.stdout)
+    
+    def test_dry_run_diff(self):
+        """Test that --diff prints unified diffs for changed pages during a dry run"""
+        self.create_test_file('journals/2023_09_04.md', "- TODO Write report\n")
+        self.create_test_file('pages/Unchanged.md', "Nothing to convert\n")
         
-        with open(output_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        # In dry-run, the file should contain the original content unchanged
-        self.assertEqual(content, "# Test Dry Run\n\nSome content.\n")
+        result = self.run_script([
+            '--src', self.test_dir,
+            '--out', os.path.join(self.test_dir, 'output'),
+            '--rename-journals',
+            '--dry-run',
+            '--diff', '5'
+        ])
+        
+        self.assertEqual(result.returncode, 0)
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'output')))
+        self.assertIn('Processed 2 files; changed 1. Renamed 1 journals.', result.stdout)
+        self.assertIn('-- TODO Write report', result.stdout)
+        self.assertIn('+- [ ] Write report', result.stdout)
+        self.assertNotIn('Unchanged.md', result.stdout)
+        self.assertIn('RENAME:', result.stdout)
     
     def test_help_output(self):
         """Test that help output is displayed correctly"""